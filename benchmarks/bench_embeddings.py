@@ -0,0 +1,126 @@
+# benchmarks/bench_embeddings.py
+"""
+Embedding 后端基准：对比不同推理后端 / 批大小 / 多进程计算的吞吐与检索质量。
+
+1. 吞吐：对切分后的代码块计算向量，报告 chunks/s
+2. 检索质量：以检索节点的回退查询 "definition of <name>" 查找每个定义块
+   - recall@k: 定义块出现在 top-k 中的比例
+   - overlap@k: 与第一个后端（基准，默认 torch）top-k 结果的重合率
+
+运行方式（在仓库根目录，需要 sentence-transformers；onnx 后端需要 `sentence-transformers[onnx]`）:
+    python -m benchmarks.bench_embeddings --backends torch onnx onnx-int8 --batch-size 64
+"""
+
+import argparse
+import os
+import time
+from typing import Dict, List
+
+import numpy as np
+from langchain_core.documents import Document
+
+from src.config import settings
+from src.ingestion.github_loader import SUPPORTED_EXTENSIONS
+from src.ingestion.tree_sitter import Splitter_with_treeSitter
+from src.rag.embeddings import build_embeddings
+
+DEFAULT_ROOT = os.path.join(os.path.dirname(__file__), os.pardir, "src")
+
+
+def load_chunks(root: str) -> List[Document]:
+    docs = []
+    for directory, _, filenames in os.walk(root):
+        for filename in sorted(filenames):
+            if not filename.endswith(SUPPORTED_EXTENSIONS):
+                continue
+            path = os.path.join(directory, filename)
+            with open(path, encoding="utf-8", errors="ignore") as f:
+                content = f.read()
+            if content:
+                docs.append(Document(page_content=content, metadata={"source": path}))
+    return Splitter_with_treeSitter(docs)
+
+
+def _normalize(vectors: List[List[float]]) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def run_backend(
+    backend: str,
+    chunks: List[Document],
+    queries: List[str],
+    batch_size: int,
+    multi_process: bool,
+    k: int,
+) -> Dict[str, object]:
+    """计算一个后端的吞吐与每条查询的 top-k 结果"""
+    start = time.perf_counter()
+    model = build_embeddings(
+        backend=backend, batch_size=batch_size, multi_process=multi_process
+    )
+    load_elapsed = time.perf_counter() - start
+
+    texts = [chunk.page_content for chunk in chunks]
+    # 预热一次，避免把模型的首次初始化（以及多进程池启动）计入吞吐
+    model.embed_documents(texts[:batch_size])
+
+    start = time.perf_counter()
+    doc_vectors = _normalize(model.embed_documents(texts))
+    embed_elapsed = time.perf_counter() - start
+
+    query_vectors = _normalize([model.embed_query(query) for query in queries])
+    scores = query_vectors @ doc_vectors.T
+    top_k = np.argsort(-scores, axis=1)[:, :k]
+
+    if hasattr(model, "close"):
+        model.close()
+
+    return {
+        "load": load_elapsed,
+        "throughput": len(texts) / embed_elapsed,
+        "top_k": top_k,
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--root", default=DEFAULT_ROOT, help="待切分的代码目录")
+    arg_parser.add_argument("--backends", nargs="+", default=["torch", "onnx-int8"])
+    arg_parser.add_argument(
+        "--batch-size", type=int, default=settings.EMBEDDING_BATCH_SIZE
+    )
+    arg_parser.add_argument("--multi-process", action="store_true")
+    arg_parser.add_argument("--k", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    chunks = load_chunks(args.root)
+    targets = [i for i, chunk in enumerate(chunks) if chunk.metadata.get("name")]
+    queries = [f"definition of {chunks[i].metadata['name']}" for i in targets]
+    print(f"=== {len(chunks)} 个代码块, {len(queries)} 条定义查询 ===")
+
+    baseline = None
+    for backend in args.backends:
+        result = run_backend(
+            backend, chunks, queries, args.batch_size, args.multi_process, args.k
+        )
+        top_k = result["top_k"]
+        recall = np.mean([target in row for target, row in zip(targets, top_k)])
+
+        line = (
+            f"{backend:<10} 加载 {result['load']:.1f}s  "
+            f"{result['throughput']:,.0f} chunks/s  recall@{args.k} {recall:.1%}"
+        )
+        if baseline is None:
+            baseline = (backend, top_k)
+        else:
+            overlap = np.mean(
+                [len(set(a) & set(b)) / args.k for a, b in zip(baseline[1], top_k)]
+            )
+            line += f"  overlap@{args.k} (vs {baseline[0]}) {overlap:.1%}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# benchmarks/bench_tree_sitter.py
+"""
+tree-sitter 切分微基准：对比「每个文档新建 Parser/编译 Query」与「编译缓存 Registry」的吞吐量。
+
+运行方式（在仓库根目录）:
+    python -m benchmarks.bench_tree_sitter --files 2000
+"""
+
+import argparse
+import time
+from typing import List, Optional
+from unittest import mock
+
+from langchain_core.documents import Document
+from tree_sitter import Parser, Query
+
+from src.ingestion.language import get_language_config
+from src.ingestion import tree_sitter as tree_sitter_module
+from src.ingestion.tree_sitter import Splitter_with_treeSitter, extract_skeleton
+
+SAMPLES = {
+    ".py": '''
+class Service{i}:
+    """Service {i}"""
+
+    def handle(self, x):
+        if x > {i}:
+            return x * 2
+        return x
+
+def helper_{i}(a, b):
+    return [v for v in a if v not in b]
+''',
+    ".js": """
+class Widget{i} {{
+  render(x) {{ return x > {i} ? x : 0; }}
+}}
+function helper{i}(a) {{ return a.map((v) => v + {i}); }}
+""",
+    ".go": """
+package main
+
+type Item{i} struct {{ A int }}
+
+func Helper{i}(a int) int {{
+    if a > {i} {{
+        return a
+    }}
+    return 0
+}}
+""",
+    ".rs": """
+struct Item{i} {{ a: i32 }}
+
+impl Item{i} {{
+    fn get(&self) -> i32 {{ if self.a > {i} {{ self.a }} else {{ 0 }} }}
+}}
+""",
+}
+
+
+def build_corpus(n_files: int) -> List[Document]:
+    exts = list(SAMPLES)
+    docs = []
+    for i in range(n_files):
+        ext = exts[i % len(exts)]
+        docs.append(
+            Document(
+                page_content=SAMPLES[ext].format(i=i),
+                metadata={"source": f"bench/file_{i}{ext}"},
+            )
+        )
+    return docs
+
+
+def _uncached_query(file_extension: str, kind: str = "query") -> Optional[Query]:
+    config = get_language_config(file_extension)
+    if not config or kind not in config:
+        return None
+    try:
+        return Query(config["lang"], config[kind])
+    except Exception:
+        return None
+
+
+def _uncached_parser(file_extension: str) -> Optional[Parser]:
+    config = get_language_config(file_extension)
+    return Parser(config["lang"]) if config else None
+
+
+def split_and_skeleton(documents: List[Document]) -> int:
+    chunks = Splitter_with_treeSitter(documents)
+    for doc in documents:
+        ext = "." + doc.metadata["source"].split(".")[-1]
+        extract_skeleton(doc.page_content, ext)
+    return len(chunks)
+
+
+def split_baseline(documents: List[Document]) -> int:
+    """优化前的行为：每个文档都新建 Parser 并重新编译 Query"""
+    with mock.patch.object(
+        tree_sitter_module, "get_query", _uncached_query
+    ), mock.patch.object(tree_sitter_module, "get_parser", _uncached_parser):
+        return split_and_skeleton(documents)
+
+
+def split_registry(documents: List[Document]) -> int:
+    return split_and_skeleton(documents)
+
+
+def run(name: str, func, documents: List[Document]) -> float:
+    start = time.perf_counter()
+    func(documents)
+    elapsed = time.perf_counter() - start
+    rate = len(documents) / elapsed
+    print(f"{name:<10} {len(documents)} files in {elapsed:.3f}s -> {rate:,.0f} files/s")
+    return rate
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--files", type=int, default=2000)
+    args = arg_parser.parse_args()
+
+    documents = build_corpus(args.files)
+    # 预热：触发一次 Registry 编译，避免把首次编译算进稳态吞吐
+    split_registry(documents[: len(SAMPLES)])
+
+    baseline = run("baseline", split_baseline, documents)
+    registry = run("registry", split_registry, documents)
+    print(f"speedup: {registry / baseline:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+public class Sample
+{
+    int Simple(int a)
+    {
+        return a + 1;
+    }
+
+    int Branches(int[] items, int limit)
+    {
+        int total = 0;
+        for (int i = 0; i < items.Length; i++)
+        {
+            if (items[i] > limit && items[i] % 2 == 0)
+            {
+                total += items[i];
+            }
+            else if (items[i] < 0 || items[i] == 7)
+            {
+                continue;
+            }
+        }
+        switch (total)
+        {
+            case 1: return 1;
+            case 2: return 2;
+            default: break;
+        }
+        try
+        {
+            return total > 100 ? 100 : total;
+        }
+        catch (System.Exception)
+        {
+            return 0;
+        }
+    }
+}
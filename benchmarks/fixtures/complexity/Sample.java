@@ -0,0 +1,26 @@
+public class Sample {
+    int simple(int a) {
+        return a + 1;
+    }
+
+    int branches(int[] items, int limit) {
+        int total = 0;
+        for (int item : items) {
+            if (item > limit && item % 2 == 0) {
+                total += item;
+            } else if (item < 0 || item == 7) {
+                continue;
+            }
+        }
+        switch (total) {
+            case 1: return 1;
+            case 2: return 2;
+            default: break;
+        }
+        try {
+            return total > 100 ? 100 : total;
+        } catch (Exception e) {
+            return 0;
+        }
+    }
+}
@@ -0,0 +1,23 @@
+int simple(int a) {
+    return a + 1;
+}
+
+int branches(int *items, int n, int limit) {
+    int total = 0;
+    for (int i = 0; i < n; i++) {
+        if (items[i] > limit && items[i] % 2 == 0) {
+            total += items[i];
+        } else if (items[i] < 0 || items[i] == 7) {
+            continue;
+        }
+    }
+    switch (total) {
+        case 1: return 1;
+        case 2: return 2;
+        default: break;
+    }
+    while (total > 100) {
+        total -= 10;
+    }
+    return total > 50 ? 50 : total;
+}
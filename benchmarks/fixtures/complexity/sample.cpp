@@ -0,0 +1,31 @@
+#include <vector>
+
+int simple(int a) {
+    return a + 1;
+}
+
+int branches(const std::vector<int>& items, int limit) {
+    int total = 0;
+    for (int item : items) {
+        if (item > limit && item % 2 == 0) {
+            total += item;
+        } else if (item < 0 || item == 7) {
+            continue;
+        }
+    }
+    try {
+        return total > 100 ? 100 : total;
+    } catch (...) {
+        return 0;
+    }
+}
+
+class Store {
+public:
+    int get(int key) {
+        if (key > 0) {
+            return key;
+        }
+        return 0;
+    }
+};
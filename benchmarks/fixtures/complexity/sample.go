@@ -0,0 +1,31 @@
+package sample
+
+func Simple(a int) int {
+	return a + 1
+}
+
+func Branches(items []int, limit int) int {
+	total := 0
+	for _, item := range items {
+		if item > limit && item%2 == 0 {
+			total += item
+		} else if item < 0 || item == 7 {
+			continue
+		}
+	}
+	switch total {
+	case 1:
+		return 1
+	case 2:
+		return 2
+	default:
+	}
+	return total
+}
+
+func (s *Store) Get(key string) int {
+	if v, ok := s.data[key]; ok {
+		return v
+	}
+	return 0
+}
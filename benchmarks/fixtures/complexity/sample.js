@@ -0,0 +1,36 @@
+function simple(a) {
+  return a + 1;
+}
+
+function branches(items, limit) {
+  let total = 0;
+  for (const item of items) {
+    if (item > limit && item % 2 === 0) {
+      total += item;
+    } else if (item < 0 || item === null) {
+      continue;
+    }
+  }
+  switch (total) {
+    case 1:
+      return 1;
+    case 2:
+      return 2;
+    default:
+      break;
+  }
+  try {
+    return total > 100 ? 100 : total;
+  } catch (e) {
+    return 0;
+  }
+}
+
+class Store {
+  get(key) {
+    if (key in this.data) {
+      return this.data[key];
+    }
+    return null;
+  }
+}
@@ -0,0 +1,24 @@
+def simple(a):
+    return a + 1
+
+
+def branches(items, limit):
+    total = 0
+    for item in items:
+        if item > limit and item % 2 == 0:
+            total += item
+        elif item < 0 or item is None:
+            continue
+    while total > 100:
+        total -= 10
+    try:
+        return total
+    except ValueError:
+        return 0
+
+
+class Store:
+    def get(self, key):
+        if key in self.data:
+            return self.data[key]
+        return None
@@ -0,0 +1,26 @@
+def simple(a)
+  a + 1
+end
+
+def branches(items, limit)
+  total = 0
+  for item in items
+    if item > limit && item.even?
+      total += item
+    elsif item < 0 || item.nil?
+      next
+    end
+  end
+  while total > 100
+    total -= 10
+  end
+  case total
+  when 1 then 1
+  when 2 then 2
+  end
+  begin
+    total
+  rescue StandardError
+    0
+  end
+end
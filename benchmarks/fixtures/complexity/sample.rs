@@ -0,0 +1,28 @@
+fn simple(a: i32) -> i32 {
+    a + 1
+}
+
+fn branches(items: &[i32], limit: i32) -> i32 {
+    let mut total = 0;
+    for item in items {
+        if *item > limit && item % 2 == 0 {
+            total += item;
+        } else if *item < 0 || *item == 7 {
+            continue;
+        }
+    }
+    while total > 100 {
+        total -= 10;
+    }
+    total
+}
+
+impl Store {
+    fn get(&self, key: &str) -> Option<i32> {
+        let v = self.data.get(key)?;
+        if *v > 0 {
+            return Some(*v);
+        }
+        None
+    }
+}
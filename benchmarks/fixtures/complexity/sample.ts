@@ -0,0 +1,27 @@
+function simple(a: number): number {
+  return a + 1;
+}
+
+function branches(items: number[], limit: number): number {
+  let total = 0;
+  for (const item of items) {
+    if (item > limit && item % 2 === 0) {
+      total += item;
+    } else if (item < 0 || item === null) {
+      continue;
+    }
+  }
+  while (total > 100) {
+    total -= 10;
+  }
+  return total > 50 ? 50 : total;
+}
+
+class Store {
+  get(key: string): number | null {
+    if (key in this.data) {
+      return this.data[key];
+    }
+    return null;
+  }
+}
@@ -2,19 +2,30 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+import asyncio
 import os
 
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
-from src.ingestion.github_loader import ingest_repo, split_repo
-from src.rag.vectorstore import get_vectorstore
+from src.config import settings
+from src.ingestion.github_loader import analyze_repo, ingest_repo, iter_repo, split_repo
+from src.ingestion.local_loader import ingest_local_repo, iter_local_repo
+from src.ingestion.manifest import IndexManifest
+from src.rag.vectorstore import (
+    get_vectorstore,
+    index_documents,
+    reset_manifest_if_empty,
+)
+from src.rag.llm_cache import enable_llm_cache
+from src.rag.definition_index import DefinitionIndex
 from src.rag.reviewer import get_review_chain, review_repo_global
 from src.ingestion.filters import filter_documents_l0
 from src.ingestion.complexity import filter_documents_l1
 from src.ingestion.tree_sitter import extract_skeleton
+from src.ingestion.streaming import stream_pipeline
 from src.agent.summarizer import generate_file_summaries
-from src.agent.batch_processor import run_batch_review
-from src.agent.tree_generator import generate_repo_tree
+from src.agent.batch_processor import arun_batch_review, run_batch_review
+from src.agent.tree_generator import build_tree_context
 
 
 def main():
@@ -46,14 +57,33 @@ def main():
 
     repo_url = "msiemens/tinydb"
     branch = "master"
-    documents = ingest_repo(repo_url, branch)
-    file_tree = generate_repo_tree(repo_url, branch)
+    # 所有链共用的 LLM 响应缓存
+    enable_llm_cache()
+    # 增量索引：只处理自上次运行以来新增或修改的文件
+    manifest = IndexManifest()
+    # 每个仓库/分支写入独立的向量库分区；新分区为空时重新索引全部文件
+    vector_store = get_vectorstore(repo_url, branch)
+    reset_manifest_if_empty(vector_store, manifest, repo_url, branch)
+    if settings.STREAMING_PIPELINE:
+        run_streaming(repo_url, branch, manifest)
+        return
+
+    if settings.LOCAL_REPO_PATH:
+        documents = ingest_local_repo(
+            settings.LOCAL_REPO_PATH, repo_url, branch, manifest=manifest
+        )
+    else:
+        documents = ingest_repo(repo_url, branch, manifest=manifest)
+    # 按文件裁剪的文件树上下文
+    tree_context = build_tree_context(
+        repo_url, branch, local_path=settings.LOCAL_REPO_PATH
+    )
     # documents_splitted = split_repo(documents, repo_url, branch="main")
     # L0 过滤文件
     core_docs, context_docs = filter_documents_l0(documents)
 
-    # 对 core_docs 进行切分之后复杂度过滤
-    core_chunks = split_repo(core_docs, repo_url, branch)
+    # 对 core_docs 进行单次解析：同时得到切分结果、复杂度 (L1) 和骨架 (L2)
+    core_chunks, core_skeletons = analyze_repo(core_docs, repo_url, branch)
     context_chunks = split_repo(context_docs, repo_url, branch)
 
     # 将文档分片存入向量数据库
@@ -61,8 +91,14 @@ def main():
     docs.extend(core_chunks)
     docs.extend(context_chunks)
 
-    vector_store = get_vectorstore()
-    vector_store.add_documents(docs)
+    # 符号定义索引：检索节点按名字精确查找定义
+    definition_index = DefinitionIndex(repo_url, branch)
+    index_documents(vector_store, docs, manifest, repo_url, branch, definition_index)
+    definition_index.save()
+
+    if not documents:
+        print("自上次索引以来没有文件变化，跳过审查。")
+        return
 
     # L1 根据复杂度和正则得到核心代码
     critical_chunks = filter_documents_l1(core_chunks, threshold=10)
@@ -77,19 +113,102 @@ def main():
     ]
 
     l2_candidates = critical_full_files + context_docs
-    file_summaries = generate_file_summaries(l2_candidates)
+    file_summaries = generate_file_summaries(l2_candidates, skeletons=core_skeletons)
     # all_summaries_str = "\n".join([f"[{k}]: {v}" for k, v in file_summaries.items()])
 
     # L3 启用状态机进行最后审查
     print("\n=== 进入 L3 深度审查阶段 ===")
-    final_report = run_batch_review(critical_chunks, file_summaries, file_tree)
+    final_report = review(
+        critical_chunks,
+        file_summaries,
+        tree_context,
+        skeletons=core_skeletons,
+        definition_index=definition_index,
+    )
+    print("\n=== 最终审查报告 ===")
+    print(final_report)
+
+
+def review(
+    critical_chunks,
+    file_summaries,
+    tree_context,
+    skeletons=None,
+    definition_index=None,
+) -> str:
+    """L3 审查入口：按配置选择线程池 (batch) 或 asyncio (abatch) 执行"""
+    args = (critical_chunks, file_summaries, tree_context, skeletons, definition_index)
+    if settings.ASYNC_REVIEW:
+        report = asyncio.run(arun_batch_review(*args))
+    else:
+        report = run_batch_review(*args)
+
+    if definition_index is not None:
+        print(definition_index.format_stats())
+
+    llm_cache = enable_llm_cache()
+    if llm_cache is not None:
+        print(llm_cache.format_stats())
+    return report
+
+
+def run_streaming(repo_url: str, branch: str, manifest: IndexManifest):
+    """流式模式：ingest -> L0 -> 切分 -> L1 -> embed 按批次流动，峰值内存与仓库大小无关"""
+    if settings.LOCAL_REPO_PATH:
+        documents = iter_local_repo(
+            settings.LOCAL_REPO_PATH, repo_url, branch, manifest=manifest
+        )
+    else:
+        documents = iter_repo(repo_url, branch, manifest=manifest)
+    # 按文件裁剪的文件树上下文
+    tree_context = build_tree_context(
+        repo_url, branch, local_path=settings.LOCAL_REPO_PATH
+    )
+
+    vector_store = get_vectorstore(repo_url, branch)
+    definition_index = DefinitionIndex(repo_url, branch)
+    result = stream_pipeline(
+        documents,
+        repo_url,
+        branch,
+        vector_store,
+        manifest=manifest,
+        threshold=10,
+        definition_index=definition_index,
+    )
+    definition_index.save()
+
+    try:
+        if not result.files:
+            print("自上次索引以来没有文件变化，跳过审查。")
+            return
+        print(f"关键代码块数量: {result.critical}")
+
+        # L2 生成全局概括（流式模式下完整文件已释放，只使用落盘的骨架）
+        skeletons = result.load_skeletons()
+        file_summaries = generate_file_summaries(
+            result.load_l2_candidates(), skeletons=skeletons
+        )
+
+        # L3 启用状态机进行最后审查
+        print("\n=== 进入 L3 深度审查阶段 ===")
+        final_report = review(
+            result.load_critical_chunks(),
+            file_summaries,
+            tree_context,
+            skeletons=skeletons,
+            definition_index=definition_index,
+        )
+    finally:
+        result.close()
     print("\n=== 最终审查报告 ===")
     print(final_report)
 
 
-def delete_vectorstore():
-    vector_store = get_vectorstore()
+def delete_vectorstore(repo_url: str = "", branch: str = ""):
+    vector_store = get_vectorstore(repo_url, branch)
     vector_store.delete_collection()
+    get_vectorstore.cache_clear()
 
 
 if __name__ == "__main__":
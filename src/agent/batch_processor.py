@@ -1,6 +1,12 @@
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 from langchain_core.documents import Document
 from src.agent.recursive_reviewer import build_reviewer_graph
+from src.config import settings
+from src.rag.reduce import Report, atree_reduce, tree_reduce
+from src.agent.tree_context import TreeContextBuilder, extract_imports
+from src.rag.definition_index import DefinitionIndex
+from src.agent.retrieval_cache import RetrievalCache
+from src.ingestion.tree_sitter import get_extension
 
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
@@ -35,9 +41,28 @@ REDUCE_TEMPLATE = """
 """
 
 
-def run_batch_review(
-    critical_docs: List[Document], file_summaries: Dict[str, str], file_tree: str
-):
+def _prepare_batch(
+    critical_docs: List[Document],
+    file_summaries: Dict[str, str],
+    tree_context: TreeContextBuilder,
+    skeletons: Optional[Dict[str, str]] = None,
+    definition_index: Optional[DefinitionIndex] = None,
+    retrieval_cache: Optional[RetrievalCache] = None,
+) -> Tuple[List[dict], List[dict], List[str]]:
+    """
+    按文件分组关键代码块，并为每个文件构造状态机的初始状态和运行配置。
+
+    文件树不再整体发送：所有文件共用折叠后的项目结构（prompt 前缀），
+    每个文件只附带所在目录、上级目录以及其 import 的项目内模块。
+    import 从 L2 的代码骨架中提取，没有骨架时退回到关键代码块本身。
+    `definition_index` 与 `retrieval_cache` 通过运行配置的 configurable 传给检索节点，
+    所有文件共用同一个检索缓存。
+
+    Returns:
+        Tuple[List[dict], List[dict], List[str]]: 初始状态列表、配置列表、文件列表
+    """
+    skeletons = skeletons or {}
+    project_tree = tree_context.shared_tree()
 
     batch_id = f"batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
     print(f"=== 本次运行 ID: {batch_id} (可在 LangSmith 中搜索此 Tag) ===")
@@ -53,9 +78,6 @@ def run_batch_review(
     # 进行审查
     print(f"=== 开始批量审查: 共 {len(docs_by_file)} 个核心文件 ===")
 
-    reviewer_app = build_reviewer_graph()
-    file_reports = []
-
     batch_inputs = []
     batch_configs = []
     sources = []
@@ -64,11 +86,15 @@ def run_batch_review(
 
     for source, codes in docs_by_file.items():
         # print(f"启动审查: {source}")
+        # 复杂度优先；命中安全规则的代码块按 L1 已记录的命中类别数排序，无需重新扫描
         sorted_codes = sorted(
             codes,
-            key=lambda x: x.metadata.get(
-                "complexity",
-                999 if x.metadata.get("keep_reason") == "security_heuristic" else 0,
+            key=lambda x: (
+                x.metadata.get(
+                    "complexity",
+                    999 if x.metadata.get("keep_reason") == "security_heuristic" else 0,
+                ),
+                x.metadata.get("security_score", 0),
             ),
             reverse=True,
         )
@@ -78,13 +104,24 @@ def run_batch_review(
 
         current_summary = file_summaries.get(source, "暂无摘要信息。")
 
+        path = codes[0].metadata.get("path", source)
+        import_source = skeletons.get(source) or "\n".join(
+            code.page_content for code in codes
+        )
+        imports = extract_imports(import_source, get_extension(path))
+        local_tree = tree_context.file_context(path, imports)
+
         focused_context = (
-            f"「文件树」\n{file_tree}\n\n「当前文件职责」\n{current_summary}"
+            f"「文件树（局部）」\n{local_tree}\n\n「当前文件职责」\n{current_summary}"
         )
 
         initial_state = {
             "target_docs": target_code_chunks,
             "file_source": source,
+            # 检索节点据此选择向量库分区
+            "repo_name": codes[0].metadata.get("repo_name", ""),
+            "branch": codes[0].metadata.get("branch", ""),
+            "project_tree": project_tree,
             "global_context": focused_context,
             "retrieved_context": [],
             "unknown_symbols": [],
@@ -96,43 +133,121 @@ def run_batch_review(
             "run_name": f"Review: {source.split('/')[-1]}",
             "tags": [batch_id, "code_review"],
             "metadata": {"source_file": source},
-            "max_concurrency": 10,
+            "max_concurrency": settings.REVIEW_MAX_CONCURRENCY,
+            # 检索节点先查共享检索缓存，再在定义索引中精确查找，未命中再走向量检索
+            "configurable": {
+                "definition_index": definition_index,
+                "retrieval_cache": retrieval_cache,
+            },
         }
 
-        # result = reviewer_app.invoke(initial_state, config=config)
-        # report = result.get("final_report", "无报告生成")
-        # file_reports.append(f"### 文件: {source}\n{report}")
-
         batch_inputs.append(initial_state)
         batch_configs.append(config)
         sources.append(source)
 
-    print("启用并发审查...")
-    results = reviewer_app.batch(
-        batch_inputs, config=batch_configs, return_exceptions=True
-    )
+    return batch_inputs, batch_configs, sources
 
+
+def _collect_reports(sources: List[str], results: list) -> List[Report]:
+    """将状态机的输出（或异常）整理为逐文件的 (路径, 报告)"""
+    file_reports = []
     for source, result in zip(sources, results):
         if isinstance(result, Exception):
-            file_reports.append(f"### 文件: {source}\n审查失败: {str(result)}")
+            file_reports.append(
+                (source, f"### 文件: {source}\n审查失败: {str(result)}")
+            )
         else:
             report = result.get("final_report", "无报告生成")
-            file_reports.append(f"### 文件: {source}\n{report}")
+            file_reports.append((source, f"### 文件: {source}\n{report}"))
+    return file_reports
 
-    if not file_reports:
-        return "未生成任何审查报告（可能是没有核心代码通过了 L1 筛选）。"
 
-    # 汇总
+def _get_reduce_chain():
     llm = ChatOpenAI(model="deepseek-chat", temperature=0)
     reduce_prompt = ChatPromptTemplate.from_template(REDUCE_TEMPLATE)
-    reduce_chain = reduce_prompt | llm | StrOutputParser()
+    return reduce_prompt | llm | StrOutputParser()
+
+
+def _reduce_failed(e: Exception, file_reports: List[Report]) -> str:
+    combined_summaries = "\n\n".join(report for _, report in file_reports)
+    return f"汇总报告生成失败: {str(e)}\n\n以下是原始文件报告:\n{combined_summaries}"
+
 
-    combined_summaries = "\n\n".join(file_reports)
+NO_REPORT_MESSAGE = "未生成任何审查报告（可能是没有核心代码通过了 L1 筛选）。"
 
+
+def run_batch_review(
+    critical_docs: List[Document],
+    file_summaries: Dict[str, str],
+    tree_context: TreeContextBuilder,
+    skeletons: Optional[Dict[str, str]] = None,
+    definition_index: Optional[DefinitionIndex] = None,
+):
+    retrieval_cache = RetrievalCache()
+    batch_inputs, batch_configs, sources = _prepare_batch(
+        critical_docs,
+        file_summaries,
+        tree_context,
+        skeletons,
+        definition_index,
+        retrieval_cache,
+    )
+    reviewer_app = build_reviewer_graph()
+
+    print("启用并发审查...")
+    results = reviewer_app.batch(
+        batch_inputs, config=batch_configs, return_exceptions=True
+    )
+    file_reports = _collect_reports(sources, results)
+    print(retrieval_cache.format_stats())
+
+    if not file_reports:
+        return NO_REPORT_MESSAGE
+
+    # 分层汇总：报告总量超过 token 预算时先按目录做中间汇总
     try:
-        final_report = reduce_chain.invoke({"summaries": combined_summaries})
+        final_report = tree_reduce(file_reports, _get_reduce_chain())
         return final_report
     except Exception as e:
-        return (
-            f"汇总报告生成失败: {str(e)}\n\n以下是原始文件报告:\n{combined_summaries}"
-        )
+        return _reduce_failed(e, file_reports)
+
+
+async def arun_batch_review(
+    critical_docs: List[Document],
+    file_summaries: Dict[str, str],
+    tree_context: TreeContextBuilder,
+    skeletons: Optional[Dict[str, str]] = None,
+    definition_index: Optional[DefinitionIndex] = None,
+):
+    """
+    `run_batch_review` 的异步版本。
+
+    所有文件的审查在同一个事件循环中并发执行，等待 LLM / 向量库响应时不占用线程，
+    同时在途的审查数由 `settings.REVIEW_MAX_CONCURRENCY` 统一限制。
+    """
+    retrieval_cache = RetrievalCache()
+    batch_inputs, batch_configs, sources = _prepare_batch(
+        critical_docs,
+        file_summaries,
+        tree_context,
+        skeletons,
+        definition_index,
+        retrieval_cache,
+    )
+    reviewer_app = build_reviewer_graph()
+
+    print("启用异步并发审查...")
+    results = await reviewer_app.abatch(
+        batch_inputs, config=batch_configs, return_exceptions=True
+    )
+    file_reports = _collect_reports(sources, results)
+    print(retrieval_cache.format_stats())
+
+    if not file_reports:
+        return NO_REPORT_MESSAGE
+
+    # 分层汇总：报告总量超过 token 预算时先按目录做中间汇总
+    try:
+        return await atree_reduce(file_reports, _get_reduce_chain())
+    except Exception as e:
+        return _reduce_failed(e, file_reports)
@@ -1,10 +1,20 @@
-from typing import List
+from functools import lru_cache
+from typing import List, Optional, Tuple
 from pydantic import BaseModel, Field
 from src.agent.state import ReviewState
 from langchain_openai import ChatOpenAI
 from langchain_core.output_parsers import PydanticOutputParser
 from langchain_core.prompts import ChatPromptTemplate
-from src.rag.vectorstore import get_vectorstore
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from src.rag.vectorstore import (
+    asimilarity_search_batch,
+    get_vectorstore,
+    partition_filter,
+    similarity_search_batch,
+)
+from src.rag.definition_index import DefinitionIndex, normalize_symbol
+from src.agent.retrieval_cache import RetrievalCache
 from langgraph.graph import StateGraph, END
 import re
 
@@ -20,8 +30,15 @@ class ReviewOutput(BaseModel):
 
 
 # --- Prompt ---
+# 开头的角色说明与项目结构在一次运行中对所有文件都相同，作为稳定的前缀
+# 放在最前面，模型服务端的前缀缓存 (prompt caching) 可以跨请求复用
 ANALYZER_PROMPT = """
-你是一个严谨的代码审查员。正在审查仓库中的一个重要文件: {file_source}
+你是一个严谨的代码审查员。
+
+【项目结构】
+{project_tree}
+
+正在审查仓库中的一个重要文件: {file_source}
 
 【待审查代码】
 {target_code}
@@ -56,102 +73,281 @@ ANALYZER_PROMPT = """
 # --- 节点函数 ---
 
 
-def analyzer_node(state: ReviewState) -> dict:
-    """分析节点，生成对应的审查报告。如果过程中发现了未知的符号（函数名、类名等）会转向信息检索节点寻找相关信息。
-
-    Args:
-        state (ReviewState): 审查的状态
+@lru_cache(maxsize=1)
+def get_analyzer_chain():
+    """
+    构建审查链与格式指令。
+    使用 lru_cache 实现单例模式，所有节点（包括并发的异步节点）共享同一个 LLM 客户端和连接池。
 
     Returns:
-        dict: final_report 或是 unknown_symbols 和 loop_cnt
+        Tuple[Runnable, str]: 审查链和 Pydantic 格式指令
     """
     llm = ChatOpenAI(model="deepseek-chat", temperature=0)
     parser = PydanticOutputParser(pydantic_object=ReviewOutput)
-    format_instructions = parser.get_format_instructions()
+    prompt = ChatPromptTemplate.from_template(ANALYZER_PROMPT)
+    return prompt | llm | parser, parser.get_format_instructions()
 
+
+def _analyzer_inputs(state: ReviewState, format_instructions: str) -> dict:
+    """根据审查状态拼接审查链的输入"""
     # 拼接上下文
     full_context = (
         state["global_context"] + "\n\n" + "\n".join(state.get("retrieved_context", []))
     )
     target_code = "\n---\n".join(state["target_docs"])
+    return {
+        "project_tree": state.get("project_tree", ""),
+        "file_source": state["file_source"],
+        "target_code": target_code,
+        "context": full_context,
+        "format_instructions": format_instructions,  # 注入指令
+        "loop_cnt": state["loop_cnt"],
+    }
+
+
+def _analyzer_update(result: ReviewOutput, state: ReviewState) -> dict:
+    """将审查链的输出转换为状态更新"""
+    if result.is_complete:
+        return {"final_report": result.report}
+    else:
+        return {
+            "unknown_symbols": result.unknown_symbols,
+            "loop_cnt": state["loop_cnt"] + 1,
+        }
 
-    prompt = ChatPromptTemplate.from_template(ANALYZER_PROMPT)
-    chain = prompt | llm | parser
+
+def analyzer_node(state: ReviewState) -> dict:
+    """分析节点，生成对应的审查报告。如果过程中发现了未知的符号（函数名、类名等）会转向信息检索节点寻找相关信息。
+
+    Args:
+        state (ReviewState): 审查的状态
+
+    Returns:
+        dict: final_report 或是 unknown_symbols 和 loop_cnt
+    """
+    chain, format_instructions = get_analyzer_chain()
 
     try:
-        result = chain.invoke(
-            {
-                "file_source": state["file_source"],
-                "target_code": target_code,
-                "context": full_context,
-                "format_instructions": format_instructions,  # 注入指令
-                "loop_cnt": state["loop_cnt"],
-            }
-        )
+        result = chain.invoke(_analyzer_inputs(state, format_instructions))
+        return _analyzer_update(result, state)
+    except Exception as e:
+        return {"final_report": f"审查过程中发生错误: {str(e)}"}
+
 
-        if result.is_complete:
-            return {"final_report": result.report}
-        else:
-            return {
-                "unknown_symbols": result.unknown_symbols,
-                "loop_cnt": state["loop_cnt"] + 1,
-            }
+async def aanalyzer_node(state: ReviewState) -> dict:
+    """`analyzer_node` 的异步版本，等待 LLM 响应时不占用线程。"""
+    chain, format_instructions = get_analyzer_chain()
+
+    try:
+        result = await chain.ainvoke(_analyzer_inputs(state, format_instructions))
+        return _analyzer_update(result, state)
     except Exception as e:
         return {"final_report": f"审查过程中发生错误: {str(e)}"}
 
 
-def retriever_node(state: ReviewState):
+def _match_definition(symbol: str, docs: List[Document]) -> Optional[Document]:
+    """在检索结果中找出确实是 symbol 定义的代码块，找不到时返回 None"""
+    target_doc = None
+
+    # 2. 优先筛选：利用 Metadata 中的 type 字段
+    # 我们在 tree-sitter 切分时保存了 "function_definition" 或 "class_definition"
+    for doc in docs:
+        doc_type = doc.metadata.get("type", "")
+        if "definition" in doc_type:
+            # 双重确认：确保 symbol 真的出现在内容里（防止语义漂移）
+            if symbol in doc.page_content:
+                target_doc = doc
+                break
+
+    # 3. 次级筛选：如果 Metadata 没命中，尝试正则匹配内容
+    if not target_doc and docs:
+        # 匹配 "def symbol" 或 "class symbol"
+        pattern = re.compile(rf"(def|class)\s+{re.escape(symbol)}\b")
+        for doc in docs:
+            if pattern.search(doc.page_content):
+                target_doc = doc
+                break
+
+    return target_doc
+
+
+def _confirms(symbol: str, docs: List[Document]) -> bool:
+    """
+    检索结果是否确认了 symbol 的存在：来自定义索引的精确命中（chunk 的 name 与符号一致），
+    或者向量检索结果中能匹配到它的定义。
+    """
+    name = normalize_symbol(symbol).split(".")[-1]
+    if any(doc.metadata.get("name") == name for doc in docs):
+        return True
+    return _match_definition(symbol, docs) is not None
+
+
+def _format_definition(symbol: str, docs: List[Document]) -> str:
+    """从检索结果中挑选最可能是 symbol 定义的代码块，并格式化为上下文"""
+    target_doc = _match_definition(symbol, docs)
+
+    # 4. 兜底：docs 已经过 `_confirm` 确认（例如按限定名命中定义索引，但内容里只有短名字），
+    # 取第一个即可
+    if not target_doc and docs:
+        target_doc = docs[0]
+
+    if target_doc:
+        source = target_doc.metadata.get("source", "unknown")
+        return f"--- {symbol} 定义 (from {source}) ---\n{target_doc.page_content}"
+    else:
+        # 如果查不到，可以尝试查 L2
+        return f"--- {symbol} --- \n(未在核心代码库中找到定义)"
+
+
+def _definition_index(config: RunnableConfig) -> Optional[DefinitionIndex]:
+    """从运行配置中取出切分阶段构建的符号定义索引"""
+    return (config or {}).get("configurable", {}).get("definition_index")
+
+
+def _retrieval_cache(config: RunnableConfig) -> Optional[RetrievalCache]:
+    """从运行配置中取出本次批量审查共享的检索缓存"""
+    return (config or {}).get("configurable", {}).get("retrieval_cache")
+
+
+def _lookup_ids(index: Optional[DefinitionIndex], symbols: List[str]) -> dict:
+    """在符号定义索引中精确查找每个符号，返回 符号 -> chunk ID 列表"""
+    return {symbol: index.lookup(symbol) if index else [] for symbol in symbols}
+
+
+def _collect_docs(ids_by_symbol: dict, fetched: List[Document]) -> dict:
+    """将一次批量取回的 chunk 按符号重新分组"""
+    by_id = {doc.id: doc for doc in fetched}
+    return {
+        symbol: [by_id[chunk_id] for chunk_id in ids if chunk_id in by_id]
+        for symbol, ids in ids_by_symbol.items()
+    }
+
+
+def _fallback_queries(symbols: List[str]) -> List[str]:
+    # "definition of X" 能同时匹配 function_definition 和 class_definition
+    return [f"definition of {symbol}" for symbol in symbols]
+
+
+def _retrieve(vector_store, index, symbols: List[str], filter=None) -> dict:
+    """
+    检索一组符号：索引命中的 chunk 通过一次 `get_by_ids` 取回（无需计算 embedding），
+    未命中的符号合并为一次批量向量检索（一批 embedding + 一次多查询请求）。
+    """
+    ids_by_symbol = _lookup_ids(index, symbols)
+    all_ids = list(dict.fromkeys(i for ids in ids_by_symbol.values() for i in ids))
+    fetched = vector_store.get_by_ids(all_ids) if all_ids else []
+    docs_by_symbol = _collect_docs(ids_by_symbol, fetched)
+
+    misses = [symbol for symbol in symbols if not docs_by_symbol[symbol]]
+    results = similarity_search_batch(
+        vector_store, _fallback_queries(misses), k=3, filter=filter
+    )
+    docs_by_symbol.update(zip(misses, results))
+    return docs_by_symbol
+
+
+async def _aretrieve(vector_store, index, symbols: List[str], filter=None) -> dict:
+    """`_retrieve` 的异步版本"""
+    ids_by_symbol = _lookup_ids(index, symbols)
+    all_ids = list(dict.fromkeys(i for ids in ids_by_symbol.values() for i in ids))
+    fetched = await vector_store.aget_by_ids(all_ids) if all_ids else []
+    docs_by_symbol = _collect_docs(ids_by_symbol, fetched)
+
+    misses = [symbol for symbol in symbols if not docs_by_symbol[symbol]]
+    results = await asimilarity_search_batch(
+        vector_store, _fallback_queries(misses), k=3, filter=filter
+    )
+    docs_by_symbol.update(zip(misses, results))
+    return docs_by_symbol
+
+
+def _cached(config: RunnableConfig, symbols: List[str]) -> Tuple[dict, List[str]]:
+    """返回 (检索缓存中已有的结果, 仍需检索的符号)"""
+    cache = _retrieval_cache(config)
+    unique = list(dict.fromkeys(symbols))
+    docs_by_symbol = cache.get_many(unique) if cache else {}
+    pending = [symbol for symbol in unique if symbol not in docs_by_symbol]
+    return docs_by_symbol, pending
+
+
+def _confirm(retrieved: dict) -> dict:
+    """
+    只保留确认为符号定义的检索结果。向量检索总会返回 top-k 个结果，不能以"结果为空"
+    判断符号不存在：既没有被定义索引命中、结果中也匹配不到定义的符号记为空列表。
+    本次输出与写入检索缓存的都是这个结果，同一符号无论由哪个状态机先检索，
+    得到的上下文都相同（未确认时均为"未找到定义"）。
+    """
+    return {
+        symbol: docs if _confirms(symbol, docs) else []
+        for symbol, docs in retrieved.items()
+    }
+
+
+def _store(config: RunnableConfig, retrieved: dict) -> None:
+    """写入检索缓存，空列表即负缓存，后续循环不再检索"""
+    cache = _retrieval_cache(config)
+    if cache is not None:
+        cache.put_many(retrieved)
+
+
+def retriever_node(state: ReviewState, config: RunnableConfig):
     """信息检索节点，检索审查节点当中发现的未知符号。
 
+    先查本次批量审查共享的检索缓存（包括"未找到"的负缓存），
+    剩余的符号先在符号定义索引中精确查找，未命中时再回退到批量向量检索。
+    只检索状态中 repo_name / branch 所在的向量库分区。
+
     Args:
         state (ReviewState): 审查的状态
+        config (RunnableConfig): 运行配置，`configurable.definition_index` 为定义索引，
+            `configurable.retrieval_cache` 为共享检索缓存
 
     Returns:
         dict: 检索到的上下文
     """
-    vector_store = get_vectorstore()
-    new_context = []
+    symbols = state["unknown_symbols"]
+    print(f"   [Retriever] 正在查找: {symbols}")
+
+    docs_by_symbol, pending = _cached(config, symbols)
+    if pending:
+        retrieved = _confirm(
+            _retrieve(
+                get_vectorstore(state["repo_name"], state["branch"]),
+                _definition_index(config),
+                pending,
+                filter=partition_filter(state["repo_name"], state["branch"]),
+            )
+        )
+        _store(config, retrieved)
+        docs_by_symbol.update(retrieved)
 
-    print(f"   [Retriever] 正在查找: {state['unknown_symbols']}")
+    new_context = [
+        _format_definition(symbol, docs_by_symbol[symbol]) for symbol in symbols
+    ]
+    return {"retrieved_context": new_context}
 
-    for symbol in state["unknown_symbols"]:
-        # "definition of X" 能同时匹配 function_definition 和 class_definition
-        docs = vector_store.similarity_search(f"definition of {symbol}", k=3)
 
-        target_doc = None
+async def aretriever_node(state: ReviewState, config: RunnableConfig):
+    """`retriever_node` 的异步版本"""
+    symbols = state["unknown_symbols"]
+    print(f"   [Retriever] 正在查找: {symbols}")
 
-        # 2. 优先筛选：利用 Metadata 中的 type 字段
-        # 我们在 tree-sitter 切分时保存了 "function_definition" 或 "class_definition"
-        for doc in docs:
-            doc_type = doc.metadata.get("type", "")
-            if "definition" in doc_type:
-                # 双重确认：确保 symbol 真的出现在内容里（防止语义漂移）
-                if symbol in doc.page_content:
-                    target_doc = doc
-                    break
-
-        # 3. 次级筛选：如果 Metadata 没命中，尝试正则匹配内容
-        if not target_doc and docs:
-            # 匹配 "def symbol" 或 "class symbol"
-            pattern = re.compile(rf"(def|class)\s+{re.escape(symbol)}\b")
-            for doc in docs:
-                if pattern.search(doc.page_content):
-                    target_doc = doc
-                    break
-
-        # 4. 兜底：如果都没匹配上，取相关性最高的第一个（可能是用法，但也比没有好）
-        if not target_doc and docs:
-            target_doc = docs[0]
-
-        if target_doc:
-            source = target_doc.metadata.get("source", "unknown")
-            new_context.append(
-                f"--- {symbol} 定义 (from {source}) ---\n{target_doc.page_content}"
+    docs_by_symbol, pending = _cached(config, symbols)
+    if pending:
+        retrieved = _confirm(
+            await _aretrieve(
+                get_vectorstore(state["repo_name"], state["branch"]),
+                _definition_index(config),
+                pending,
+                filter=partition_filter(state["repo_name"], state["branch"]),
             )
-        else:
-            # 如果查不到，可以尝试查 L2
-            new_context.append(f"--- {symbol} --- \n(未在核心代码库中找到定义)")
+        )
+        _store(config, retrieved)
+        docs_by_symbol.update(retrieved)
 
+    new_context = [
+        _format_definition(symbol, docs_by_symbol[symbol]) for symbol in symbols
+    ]
     return {"retrieved_context": new_context}
 
 
@@ -162,8 +358,11 @@ def build_reviewer_graph():
         StateGraph: 设置完成的状态机
     """
     workflow = StateGraph(ReviewState)
-    workflow.add_node("analyzer", analyzer_node)
-    workflow.add_node("retriever", retriever_node)
+    # 同时注册同步与异步实现：invoke/batch 走同步节点，ainvoke/abatch 走异步节点
+    workflow.add_node("analyzer", RunnableLambda(analyzer_node, afunc=aanalyzer_node))
+    workflow.add_node(
+        "retriever", RunnableLambda(retriever_node, afunc=aretriever_node)
+    )
 
     workflow.set_entry_point("analyzer")
 
@@ -0,0 +1,58 @@
+# src/agent/retrieval_cache.py
+import threading
+from typing import Dict, Iterable, List
+
+from langchain_core.documents import Document
+
+from src.rag.definition_index import normalize_symbol
+
+
+class RetrievalCache:
+    """
+    单次批量审查内共享的检索缓存：符号 -> 检索到的 chunk。
+
+    同一次 `run_batch_review` 中，许多文件会反复查找相同的内部工具函数，
+    而每个文件的状态机都是独立运行的。缓存由所有并发的状态机共享（通过运行配置的
+    configurable 传入），热门符号每次运行只检索一次。
+    检索结果无法确认为该符号定义的符号同样会被记录（负缓存，见 recursive_reviewer 的 `_store`），
+    后续循环不会再次查找。
+    缓存只在内存中保存，生命周期为一次批量审查，不会读到过期的向量库内容。
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self._data: Dict[str, List[Document]] = {}
+        self._lock = threading.Lock()
+
+    def get_many(self, symbols: Iterable[str]) -> Dict[str, List[Document]]:
+        """
+        返回已缓存的符号及其 chunk（负缓存为空列表），未缓存的符号不出现在结果中。
+        """
+        found = {}
+        with self._lock:
+            for symbol in symbols:
+                docs = self._data.get(normalize_symbol(symbol))
+                if docs is None:
+                    self.misses += 1
+                    continue
+                if docs:
+                    self.hits += 1
+                else:
+                    self.negative_hits += 1
+                found[symbol] = docs
+        return found
+
+    def put_many(self, docs_by_symbol: Dict[str, List[Document]]) -> None:
+        with self._lock:
+            for symbol, docs in docs_by_symbol.items():
+                self._data[normalize_symbol(symbol)] = list(docs)
+
+    def format_stats(self) -> str:
+        total = self.hits + self.negative_hits + self.misses
+        hit_rate = (self.hits + self.negative_hits) / total if total else 0.0
+        return (
+            f"检索缓存: 命中 {self.hits}, 负缓存命中 {self.negative_hits}, "
+            f"实际检索 {self.misses} (命中率 {hit_rate:.1%})"
+        )
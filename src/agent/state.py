@@ -8,8 +8,11 @@ class ReviewState(TypedDict):
     # 输入
     target_docs: List[str]  # 当前批次的代码块内容列表
     file_source: str  # 当前的文件名及其目录
+    repo_name: str  # 所属仓库，与 branch 一起决定检索的向量库分区
+    branch: str  # 所属分支
 
     # 上下文
+    project_tree: str  # 折叠后的项目结构，所有文件共用，作为 prompt 的稳定前缀
     global_context: str  # L2生成的各部分摘要 + 通过README进行的仓库概述（如果有的话
     retrieved_context: Annotated[List[str], operator.add]  # 累计检索到的补充信息
 
@@ -2,9 +2,10 @@
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from typing import Dict, List
+from typing import Dict, List, Optional
 from langchain_core.documents import Document
 from src.ingestion.tree_sitter import extract_skeleton
+from src.agent.summary_cache import SummaryCache, get_summary_cache
 
 # 定义摘要 Prompt
 SUMMARY_TEMPLATE = """
@@ -22,16 +23,27 @@ SUMMARY_TEMPLATE = """
 3. 不要包含具体实现细节。
 4. 完全基于事实回答，不要进行任何的猜想。
 """
+# 修改 SUMMARY_TEMPLATE 或摘要模型时递增，使已缓存的摘要失效
+SUMMARY_PROMPT_VERSION = "1"
 
 
-def generate_file_summaries(docs: List[Document]) -> Dict[str, str]:
+def generate_file_summaries(
+    docs: List[Document],
+    skeletons: Optional[Dict[str, str]] = None,
+    cache: Optional[SummaryCache] = None,
+) -> Dict[str, str]:
     """
     L2 层：为每个文件生成摘要。
 
     Args:
         docs: 需要生成摘要的文档列表 (通常是 context_docs + critical_docs 的原始文件版本)
         注意：这里最好传入未切分的原始文件 Document，或者按文件名聚合后的 Document。
+        skeletons: 单次解析分析流程预先提取的 source -> 代码骨架，命中时不再重复解析
+        cache: 摘要缓存，默认使用全局单例。骨架未变化的文件直接复用上次的摘要，不调用 LLM
     """
+    skeletons = skeletons or {}
+    cache = cache or get_summary_cache()
+    summaries = {}
     # 使用便宜的小模型
     llm = ChatOpenAI(model="deepseek-chat", temperature=0)
     # 或者 model="gemini-1.5-flash"
@@ -39,7 +51,6 @@ def generate_file_summaries(docs: List[Document]) -> Dict[str, str]:
     chain = ChatPromptTemplate.from_template(SUMMARY_TEMPLATE) | llm | StrOutputParser()
 
     batch_inputs = []
-    valid_docs = []
 
     # 批处理优化：实际生产中建议使用 llm.batch 或异步处理
     print(f"L2 摘要生成开始: 处理 {len(docs)} 个文件...")
@@ -48,24 +59,35 @@ def generate_file_summaries(docs: List[Document]) -> Dict[str, str]:
         filepath = doc.metadata.get("source", "unknown")
         ext = "." + filepath.split(".")[-1] if "." in filepath else ""
 
-        # 1. 提取骨架
-        skeleton = extract_skeleton(doc.page_content, ext)
+        # 1. 提取骨架（优先复用已有结果）
+        skeleton = skeletons.get(filepath)
+        if skeleton is None:
+            skeleton = extract_skeleton(doc.page_content, ext)
         if not skeleton.strip():
             continue
 
+        # 2. 骨架未变化时复用缓存的摘要
+        cached = cache.get(filepath, skeleton, SUMMARY_PROMPT_VERSION)
+        if cached is not None:
+            summaries[filepath] = cached
+            continue
+
         batch_inputs.append({"filepath": filepath, "skeleton": skeleton})
-        valid_docs.append(doc)
 
-    # 2. 生成摘要
+    # 3. 生成摘要
+    summaries_list = []
     try:
-        summaries_list = chain.batch(batch_inputs, config={"max_concurrency": 10})
+        if batch_inputs:
+            summaries_list = chain.batch(batch_inputs, config={"max_concurrency": 10})
         # print(f"摘要: {summary}")
     except Exception as e:
         print(f"摘要生成失败 ({filepath}): {e}")
 
-    summaries = {}
-    for doc, summary in zip(valid_docs, summaries_list):
-        filepath = doc.metadata.get("source", "unknown")
+    for inputs, summary in zip(batch_inputs, summaries_list):
+        filepath = inputs["filepath"]
         summaries[filepath] = summary
+        cache.put(filepath, inputs["skeleton"], SUMMARY_PROMPT_VERSION, summary)
 
+    cache.save()
+    print(cache.format_stats())
     return summaries
@@ -0,0 +1,74 @@
+# src/agent/summary_cache.py
+import hashlib
+import json
+import os
+import threading
+from functools import lru_cache
+from typing import Dict, Optional
+
+from src.config import settings
+
+
+class SummaryCache:
+    """
+    L2 文件摘要缓存：source -> (骨架哈希, 摘要)。
+
+    摘要只依赖代码骨架（签名 + 注释），只修改函数体的提交不会改变骨架，
+    因此缓存键为 sha256(prompt 版本 + 骨架)。每个文件只保留最新的一条记录，
+    骨架或 prompt 版本变化时旧记录自然失效，文件大小与仓库文件数成正比。
+    """
+
+    def __init__(self, path: str = settings.SUMMARY_CACHE_PATH):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._data: Dict[str, Dict[str, str]] = {}
+        self._lock = threading.Lock()
+
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self._data = json.load(f)
+
+    @staticmethod
+    def _key(skeleton: str, prompt_version: str) -> str:
+        raw = f"{prompt_version}\0{skeleton}".encode("utf-8")
+        return hashlib.sha256(raw).hexdigest()
+
+    def get(self, source: str, skeleton: str, prompt_version: str) -> Optional[str]:
+        """骨架与 prompt 版本都未变化时返回上次的摘要，否则返回 None"""
+        entry = self._data.get(source)
+        if entry and entry["key"] == self._key(skeleton, prompt_version):
+            self.hits += 1
+            return entry["summary"]
+        self.misses += 1
+        return None
+
+    def put(self, source: str, skeleton: str, prompt_version: str, summary: str):
+        with self._lock:
+            self._data[source] = {
+                "key": self._key(skeleton, prompt_version),
+                "summary": summary,
+            }
+
+    def save(self) -> None:
+        """原子写入缓存文件"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._lock:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+
+    def format_stats(self) -> str:
+        total = self.hits + self.misses
+        hit_rate = self.hits / total if total else 0.0
+        return f"L2 摘要缓存: 命中 {self.hits}, 未命中 {self.misses} (命中率 {hit_rate:.1%})"
+
+
+@lru_cache(maxsize=1)
+def get_summary_cache() -> SummaryCache:
+    """使用 lru_cache 实现单例模式，同一进程内共享一份摘要缓存"""
+    return SummaryCache()
@@ -0,0 +1,237 @@
+# src/agent/tree_context.py
+import posixpath
+import re
+from typing import Dict, List, Optional
+
+from src.config import settings
+from src.rag.tokens import count_tokens, truncate_to_tokens
+
+# 各语言 import 语句的正则，捕获被导入的模块 / 路径
+IMPORT_PATTERNS = {
+    ".py": [r"^\s*from\s+([.\w]+)\s+import\b", r"^\s*import\s+([\w.]+)"],
+    ".js": [
+        r"""^\s*(?:import|export)\b[^'"\n]*?\bfrom\s+['"]([^'"]+)['"]""",
+        r"""^\s*import\s+['"]([^'"]+)['"]""",
+        r"""\brequire\(\s*['"]([^'"]+)['"]\s*\)""",
+    ],
+    ".java": [r"^\s*import\s+(?:static\s+)?([\w.]+)"],
+    ".go": [
+        r'^\s*import\s+(?:[\w.]+\s+)?"([^"]+)"',
+        r'^\s*(?:[\w.]+\s+)?"([^"]+)"\s*$',
+    ],
+    ".rb": [r"""^\s*require(?:_relative)?\s*\(?\s*['"]([^'"]+)['"]"""],
+    ".c": [r'^\s*#\s*include\s+"([^"]+)"'],
+    ".cs": [r"^\s*using\s+(?:static\s+)?([\w.]+)\s*;"],
+    ".rs": [r"^\s*(?:pub\s+)?use\s+([\w:]+)", r"^\s*(?:pub\s+)?mod\s+(\w+)\s*;"],
+}
+IMPORT_PATTERNS[".ts"] = IMPORT_PATTERNS[".js"]
+IMPORT_PATTERNS[".cpp"] = IMPORT_PATTERNS[".c"]
+
+_COMPILED_IMPORTS = {
+    ext: [re.compile(p, re.MULTILINE) for p in patterns]
+    for ext, patterns in IMPORT_PATTERNS.items()
+}
+
+# 作为目录入口的文件名，例如 `import pkg` 对应 pkg/__init__.py
+_PACKAGE_ENTRY_NAMES = {"__init__", "index", "mod", "main"}
+
+# 每个文件最多列出的依赖模块数
+MAX_IMPORTS_PER_FILE = 10
+
+
+def extract_imports(code: str, extension: str) -> List[str]:
+    """
+    从代码（或代码骨架）中提取 import 的模块名 / 路径，保持出现顺序并去重。
+    Args:
+        code (str): 代码内容
+        extension (str): 代码文件后缀名
+    Returns:
+        List[str]: 被导入的模块
+    """
+    found = {}
+    for pattern in _COMPILED_IMPORTS.get(extension, []):
+        for match in pattern.finditer(code):
+            found.setdefault(match.start(), match.group(1))
+    return list(dict.fromkeys(found[pos] for pos in sorted(found)))
+
+
+def _strip_extension(path: str) -> str:
+    root, _ = posixpath.splitext(path)
+    return root
+
+
+class TreeContextBuilder:
+    """
+    按文件裁剪项目结构上下文，避免把完整文件树重复发送给每一次审查。
+
+    上下文分为两部分:
+        1. `shared_tree()`：折叠后的项目结构，所有文件共用且每次运行都相同，
+           放在 prompt 最前面，便于模型服务端的前缀缓存 (prompt caching) 命中
+        2. `file_context()`：当前文件所在目录、上级目录与其 import 的项目内模块
+    两部分都有硬性的 token 上限。
+    """
+
+    def __init__(
+        self,
+        paths: List[str],
+        shared_budget: int = settings.TREE_CONTEXT_SHARED_BUDGET,
+        file_budget: int = settings.TREE_CONTEXT_FILE_BUDGET,
+        title: str = "",
+    ):
+        self.shared_budget = shared_budget
+        self.file_budget = file_budget
+        self.title = title
+
+        # 目录 -> {子目录名}, {文件名}
+        self._dirs: Dict[str, set] = {"": set()}
+        self._files: Dict[str, set] = {"": set()}
+        # 模块路径后缀 -> 文件 / 目录路径，用于解析 import
+        self._suffix_index: Dict[str, List[str]] = {}
+
+        for path in sorted(set(paths)):
+            directory, name = posixpath.split(path)
+            self._add_dir(directory)
+            self._files[directory].add(name)
+            self._index(_strip_extension(path), path)
+            if _strip_extension(name) in _PACKAGE_ENTRY_NAMES and directory:
+                self._index(directory, path)
+
+        self._file_counts: Dict[str, int] = {}
+        self._count_files("")
+        self._shared_tree: Optional[str] = None
+
+    def _add_dir(self, directory: str) -> None:
+        if directory in self._dirs:
+            return
+        parent, name = posixpath.split(directory)
+        self._add_dir(parent)
+        self._dirs[parent].add(name)
+        self._dirs[directory] = set()
+        self._files[directory] = set()
+
+    def _index(self, module_path: str, target: str) -> None:
+        parts = module_path.split("/")
+        for i in range(len(parts)):
+            suffix = "/".join(parts[i:])
+            targets = self._suffix_index.setdefault(suffix, [])
+            if target not in targets:
+                targets.append(target)
+
+    def _count_files(self, directory: str) -> int:
+        count = len(self._files[directory])
+        for name in self._dirs[directory]:
+            count += self._count_files(posixpath.join(directory, name))
+        self._file_counts[directory] = count
+        return count
+
+    def _render(
+        self, directory: str, depth: int, prefix: str = "", mark: str = ""
+    ) -> List[str]:
+        """渲染目录，超过 depth 的子目录折叠为 `name/ (N 个文件)`"""
+        entries = [(name, True) for name in sorted(self._dirs[directory])]
+        entries += [(name, False) for name in sorted(self._files[directory])]
+
+        lines = []
+        for i, (name, is_dir) in enumerate(entries):
+            is_last = i == len(entries) - 1
+            connector = "└──" if is_last else "├──"
+            path = posixpath.join(directory, name)
+
+            if not is_dir:
+                marker = "  <-- 当前文件" if path == mark else ""
+                lines.append(f"{prefix}{connector}{name}{marker}")
+            elif depth <= 1:
+                lines.append(
+                    f"{prefix}{connector}{name}/ ({self._file_counts[path]} 个文件)"
+                )
+            else:
+                lines.append(f"{prefix}{connector}{name}/")
+                extension = "   " if is_last else "│   "
+                lines.extend(self._render(path, depth - 1, prefix + extension, mark))
+        return lines
+
+    def shared_tree(self) -> str:
+        """
+        折叠后的项目结构（所有文件共用）。从较深的层级开始渲染，超出预算时逐层折叠。
+        """
+        if self._shared_tree is not None:
+            return self._shared_tree
+
+        for depth in (3, 2, 1):
+            lines = ([self.title] if self.title else []) + self._render("", depth)
+            tree = "\n".join(lines)
+            if count_tokens(tree) <= self.shared_budget:
+                break
+        self._shared_tree = truncate_to_tokens(tree, self.shared_budget)
+        return self._shared_tree
+
+    def resolve_imports(self, path: str, imports: List[str]) -> List[str]:
+        """
+        将 import 的模块解析为项目内的文件 / 目录路径，第三方库和标准库会被忽略。
+        """
+        directory = posixpath.dirname(path)
+        resolved = []
+        for module in imports:
+            for target in self._resolve(directory, module):
+                if target != path and target not in resolved:
+                    resolved.append(target)
+            if len(resolved) >= MAX_IMPORTS_PER_FILE:
+                break
+        return resolved[:MAX_IMPORTS_PER_FILE]
+
+    def _resolve(self, directory: str, module: str) -> List[str]:
+        # 相对路径：./x, ../x (JS / Ruby / C)，以及 Python 的 .x, ..x
+        if module.startswith("."):
+            if "/" in module:
+                fragment = posixpath.normpath(posixpath.join(directory, module))
+            else:
+                level = len(module) - len(module.lstrip("."))
+                base = directory
+                for _ in range(level - 1):
+                    base = posixpath.dirname(base)
+                rest = module.lstrip(".").replace(".", "/")
+                fragment = posixpath.join(base, rest) if rest else base
+            return self._suffix_index.get(_strip_extension(fragment), [])[:3]
+
+        if "/" in module:
+            fragment = _strip_extension(module)
+        else:
+            fragment = re.sub(r"::|\.", "/", module)
+        parts = [
+            p for p in fragment.split("/") if p not in ("crate", "self", "super", "*")
+        ]
+
+        # 先尝试完整模块，再去掉最后一段（导入的是模块内的类 / 函数）
+        for candidate in (parts, parts[:-1]):
+            # 去掉前缀（例如 Go 的 module 路径、Java 的包前缀）直到命中
+            for i in range(len(candidate)):
+                targets = self._suffix_index.get("/".join(candidate[i:]))
+                if targets:
+                    return targets[:3]
+        return []
+
+    def file_context(self, path: str, imports: Optional[List[str]] = None) -> str:
+        """
+        当前文件的局部结构：所在目录、import 的项目内模块、上级目录（按优先级排列，
+        超出预算时从末尾截断）。
+        """
+        directory = posixpath.dirname(path)
+        sections = []
+
+        if directory in self._dirs:
+            sections.append(
+                f"「当前目录」 {directory or '/'}\n"
+                + "\n".join(self._render(directory, 1, mark=path))
+            )
+
+        resolved = self.resolve_imports(path, imports or [])
+        if resolved:
+            sections.append("「依赖模块」\n" + "\n".join(f"- {p}" for p in resolved))
+
+        parent = posixpath.dirname(directory)
+        if directory and parent in self._dirs:
+            sections.append(
+                f"「上级目录」 {parent or '/'}\n" + "\n".join(self._render(parent, 1))
+            )
+
+        return truncate_to_tokens("\n\n".join(sections), self.file_budget)
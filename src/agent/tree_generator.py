@@ -1,6 +1,9 @@
 import os
 from github import Github, Auth
+from typing import List
 from src.config import settings
+from src.agent.tree_context import TreeContextBuilder
+from src.ingestion.local_loader import list_local_paths
 
 
 def generate_repo_tree(repo_name: str, branch: str = "main") -> str:
@@ -41,6 +44,37 @@ def generate_repo_tree(repo_name: str, branch: str = "main") -> str:
     return f"Project Structure ({repo_name} @ {branch}):\n" + "\n".join(tree_lines)
 
 
+def list_repo_paths(repo_name: str, branch: str = "main") -> List[str]:
+    """
+    使用 GitHub API 获取仓库中所有文件的路径（不下载文件内容）。
+    获取失败时返回空列表。
+    """
+    github = Github(auth=Auth.Token(settings.GITHUB_TOKEN))
+    try:
+        tree = github.get_repo(repo_name).get_git_tree(sha=branch, recursive=True)
+    except Exception as e:
+        print(f"Error fetching tree: {e}")
+        return []
+    return [element.path for element in tree.tree if element.type == "blob"]
+
+
+def build_tree_context(
+    repo_name: str, branch: str = "main", local_path: str = ""
+) -> TreeContextBuilder:
+    """
+    构建 L3 审查使用的文件树上下文，按文件裁剪，代替完整的 `generate_repo_tree` 输出。
+    指定 `local_path` 时从本地数据源列出文件，不再请求 GitHub API。
+    """
+    if local_path:
+        paths = list_local_paths(local_path, branch)
+    else:
+        paths = list_repo_paths(repo_name, branch)
+    return TreeContextBuilder(
+        paths,
+        title=f"Project Structure ({repo_name} @ {branch}):",
+    )
+
+
 def _build_tree(structure, prefix=""):
     lines = []
     items = list(structure.keys())
@@ -8,17 +8,99 @@ class Config:
     CHROMA_HOST: str = os.getenv("CHROMA_HOST", "localhost")
     CHROMA_PORT: int = int(os.getenv("CHROMA_PORT", 8000))
     COLLECTION_NAME: str = "github_codebase"
+    # 向量库后端: http (Docker 中的 ChromaDB 服务) / embedded (进程内 ChromaDB) / numpy
+    VECTOR_STORE_BACKEND: str = os.getenv("VECTOR_STORE_BACKEND", "http")
+    CHROMA_PERSIST_DIR: str = os.getenv("CHROMA_PERSIST_DIR", "./.index/chroma")
+    NUMPY_STORE_PATH: str = os.getenv("NUMPY_STORE_PATH", "./.index/vectors")
+    # 向量库分区: branch (每个 repo@branch 一个集合) / repo (每个仓库一个集合，按分支过滤)
+    # / none (所有仓库共用 COLLECTION_NAME，按 repo_name + branch 元数据过滤)
+    VECTOR_STORE_PARTITION: str = os.getenv("VECTOR_STORE_PARTITION", "branch")
+    # 每次 upsert 写入的 chunk 数
+    UPSERT_BATCH_SIZE: int = int(os.getenv("UPSERT_BATCH_SIZE", 512))
 
     # Embedding 配置
     EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
     CACHE_FOLDER: str = "./notebooks/models"
+    # 推理后端: torch / onnx / onnx-int8 / openvino (见 src/rag/embeddings.py)
+    EMBEDDING_BACKEND: str = os.getenv("EMBEDDING_BACKEND", "torch")
+    # onnx-int8 使用的量化模型文件（模型仓库内的相对路径，按 CPU 指令集选择）
+    EMBEDDING_ONNX_INT8_FILE: str = os.getenv(
+        "EMBEDDING_ONNX_INT8_FILE", "onnx/model_quint8_avx2.onnx"
+    )
+    # 每次前向计算的文本数
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", 64))
+    # 使用常驻多进程池计算文档向量（CPU 多核）
+    EMBEDDING_MULTI_PROCESS: bool = os.getenv("EMBEDDING_MULTI_PROCESS", "0") == "1"
+    # Embedding 结果缓存 (按 内容哈希 + 模型名 寻址)
+    EMBEDDING_CACHE_PATH: str = os.getenv(
+        "EMBEDDING_CACHE_PATH", "./.index/embeddings.sqlite"
+    )
+    EMBEDDING_CACHE_MAX_ENTRIES: int = int(
+        os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", 500_000)
+    )
+
+    # LLM 响应缓存 (按 模型配置 + 完整 prompt 寻址)
+    LLM_CACHE_ENABLED: bool = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+    LLM_CACHE_PATH: str = os.getenv("LLM_CACHE_PATH", "./.index/llm_cache.sqlite")
+    # 过期时间 (秒)，0 表示永不过期
+    LLM_CACHE_TTL: int = int(os.getenv("LLM_CACHE_TTL", 7 * 24 * 3600))
+    LLM_CACHE_MAX_ENTRIES: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 100_000))
+
+    # L2 摘要缓存 (按 文件 + 骨架哈希 + prompt 版本 寻址)
+    SUMMARY_CACHE_PATH: str = os.getenv("SUMMARY_CACHE_PATH", "./.index/summaries.json")
 
     # Splitter 配置
     CHUNK_SIZE: int = 2000
     CHUNK_OVERLAP: int = 200
+    # tree-sitter 代码块的 token 上限：超出的节点按语法结构继续拆分；
+    # 拆分后相邻的小片段合并到不低于下限
+    CHUNK_MAX_TOKENS: int = int(os.getenv("CHUNK_MAX_TOKENS", 600))
+    CHUNK_MIN_TOKENS: int = int(os.getenv("CHUNK_MIN_TOKENS", 100))
+    # 分层切分：每个字节只属于一个代码块，嵌套的方法 / 内部函数单独成块，
+    # 外层代码块中只保留其签名，避免同一段代码被重复 embedding 和审查
+    HIERARCHICAL_CHUNKING: bool = os.getenv("HIERARCHICAL_CHUNKING", "0") == "1"
+    # 切分并行度：1 为串行，0 为使用全部 CPU 核
+    SPLIT_WORKERS: int = int(os.getenv("SPLIT_WORKERS", 1))
+    # 每次派发给子进程的文档数
+    SPLIT_CHUNKSIZE: int = int(os.getenv("SPLIT_CHUNKSIZE", 64))
+
+    # 流式流水线配置：按批次处理，峰值内存与仓库大小无关
+    STREAMING_PIPELINE: bool = os.getenv("STREAMING_PIPELINE", "0") == "1"
+    # 同时驻留在内存中的最大文件数
+    STREAM_MAX_IN_FLIGHT: int = int(os.getenv("STREAM_MAX_IN_FLIGHT", 256))
+    # 关键代码块与骨架的临时落盘目录（每次运行一个 SQLite 文件，用完即删）
+    STREAM_SPILL_DIR: str = os.getenv("STREAM_SPILL_DIR", "./.index/stream")
+
+    # L3 审查配置
+    # 同时在途的文件审查数（同步模式下为线程数，异步模式下为协程数）
+    REVIEW_MAX_CONCURRENCY: int = int(os.getenv("REVIEW_MAX_CONCURRENCY", 10))
+    # 使用 asyncio 执行 L3 审查，适合大量文件的高并发场景
+    ASYNC_REVIEW: bool = os.getenv("ASYNC_REVIEW", "0") == "1"
+
+    # Token 预算配置 (使用 tiktoken 计数)
+    TOKEN_ENCODING: str = os.getenv("TOKEN_ENCODING", "cl100k_base")
+    # review_repo_global 中每次 map 请求打包的代码 token 上限
+    MAP_TOKEN_BUDGET: int = int(os.getenv("MAP_TOKEN_BUDGET", 12_000))
+    # 每次汇总 (reduce) 请求输入的 token 上限，超出时分层汇总
+    REDUCE_TOKEN_BUDGET: int = int(os.getenv("REDUCE_TOKEN_BUDGET", 24_000))
+    # L3 审查的文件树上下文：所有文件共用的折叠项目结构 / 每个文件的局部结构
+    TREE_CONTEXT_SHARED_BUDGET: int = int(
+        os.getenv("TREE_CONTEXT_SHARED_BUDGET", 1_500)
+    )
+    TREE_CONTEXT_FILE_BUDGET: int = int(os.getenv("TREE_CONTEXT_FILE_BUDGET", 800))
+
+    # 增量索引配置
+    MANIFEST_PATH: str = os.getenv("MANIFEST_PATH", "./.index/manifest.json")
+
+    # 符号定义索引 (名字 / 限定名 -> chunk ID)
+    DEFINITION_INDEX_PATH: str = os.getenv(
+        "DEFINITION_INDEX_PATH", "./.index/definitions.json"
+    )
 
     # Github 配置
     GITHUB_TOKEN: str = os.getenv("GITHUB_ACCESS_TOKEN", "")
+    # 本地 checkout / bare clone / .tar.gz 路径，设置后跳过逐文件的 GitHub API 请求
+    LOCAL_REPO_PATH: str = os.getenv("LOCAL_REPO_PATH", "")
 
 
 settings = Config()
@@ -0,0 +1,93 @@
+# src/ingestion/analysis.py
+from dataclasses import dataclass, field
+from typing import List
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from src.config import settings
+from src.ingestion.complexity import tree_complexity
+from src.ingestion.language import get_query
+from src.ingestion.tree_sitter import (
+    chunks_from_tree,
+    extract_skeleton,
+    get_extension,
+    get_fallback_splitter,
+    parse_code,
+    skeleton_from_tree,
+)
+
+
+@dataclass
+class FileAnalysis:
+    """单个文件一次解析得到的全部结果"""
+
+    source: str
+    chunks: List[Document] = field(default_factory=list)
+    skeleton: str = ""
+
+
+def analyze_document(
+    doc: Document, fallback_splitter: RecursiveCharacterTextSplitter
+) -> FileAnalysis:
+    """
+    单次解析分析流程：每个文件只解析一次，同时产出切分结果、骨架和圈复杂度。
+
+    切分出的代码块带有 `ccn` 元数据（块内函数的最大圈复杂度，没有函数时为 0），
+    L1 过滤会直接使用该值，不再重新解析代码块。
+
+    Args:
+        doc (Document): 待分析的文件
+        fallback_splitter: tree-sitter 不适用时使用的通用 splitter
+    Returns:
+        FileAnalysis: 切分结果与骨架
+    """
+    file_path = doc.metadata.get("source", "")
+    ext = get_extension(file_path)
+    analysis = FileAnalysis(source=file_path)
+
+    if not get_query(ext, "query"):
+        analysis.chunks = fallback_splitter.split_documents([doc])
+        analysis.skeleton = extract_skeleton(doc.page_content, ext)
+        return analysis
+
+    try:
+        tree, code_bytes = parse_code(doc.page_content, ext)
+        chunks = chunks_from_tree(doc, tree, code_bytes, ext)
+        analysis.skeleton = skeleton_from_tree(tree, code_bytes, ext)
+    except Exception as e:
+        print(f"Error parsing {file_path}: {e}")
+        # 出错时退回通用切分，骨架退化为截断
+        analysis.chunks = fallback_splitter.split_documents([doc])
+        analysis.skeleton = extract_skeleton(doc.page_content, "")
+        return analysis
+
+    # 如果没有匹配到任何东西，则保留原文档
+    if not chunks:
+        analysis.chunks = fallback_splitter.split_documents([doc])
+        return analysis
+
+    # 分层切分时嵌套定义已单独成块，外层代码块的复杂度不再包含它们
+    nested = (
+        {node.id for _, node in chunks} if settings.HIERARCHICAL_CHUNKING else set()
+    )
+    for chunk, node in chunks:
+        # 超限节点拆分出的片段只统计片段内的代码
+        byte_range = (chunk.metadata["start_byte"], chunk.metadata["end_byte"])
+        chunk.metadata["ccn"] = tree_complexity(
+            node, ext, nested - {node.id}, byte_range
+        )
+        analysis.chunks.append(chunk)
+    return analysis
+
+
+def analyze_documents(documents: List[Document]) -> List[FileAnalysis]:
+    """
+    批量执行单次解析分析流程（可作为进程池的分片函数）。
+    Args:
+        documents (List[Document]): 待分析的文件列表
+    Returns:
+        List[FileAnalysis]: 与输入顺序一致的分析结果
+    """
+    fallback_splitter = get_fallback_splitter()
+    return [analyze_document(doc, fallback_splitter) for doc in documents]
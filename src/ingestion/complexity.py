@@ -1,69 +1,237 @@
-import lizard
 import re
-from typing import List
+from bisect import bisect_right
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Collection, Dict, List, Optional, Tuple
 from langchain_core.documents import Document
+from tree_sitter import Node
+from src.ingestion.language import get_language_config
+from src.ingestion.tree_sitter import get_extension, parse_code
 
 # --- 安全启发式规则 (Security Heuristics) ---
 # 如果代码包含这些模式，无论复杂度多低，都必须保留
-SENSITIVE_PATTERNS = [
+# 按类别分组，扫描结果会给出命中的类别和行号
+SENSITIVE_PATTERN_GROUPS = {
     # 危险函数
-    r"eval\(",
-    r"exec\(",
-    r"os\.system\(",
-    r"subprocess\.call",
-    r"pickle\.load",
-    r"yaml\.load",
-    r"input\(",
+    "dangerous_call": [
+        r"eval\(",
+        r"exec\(",
+        r"os\.system\(",
+        r"subprocess\.call",
+        r"pickle\.load",
+        r"yaml\.load",
+        r"input\(",
+    ],
     # 数据库/SQL 相关
-    r"SELECT.*FROM",
-    r"INSERT.*INTO",
-    r"UPDATE.*SET",
-    r"DELETE.*FROM",
-    r"cursor\.execute",
-    r"raw_sql",
+    # 使用前瞻只消费关键字本身，避免一整行被 SQL 规则吞掉而漏掉同一行的其他类别
+    "sql": [
+        r"SELECT(?=.*?FROM)",
+        r"INSERT(?=.*?INTO)",
+        r"UPDATE(?=.*?SET)",
+        r"DELETE(?=.*?FROM)",
+        r"cursor\.execute",
+        r"raw_sql",
+    ],
     # 密钥/凭证 (简单的正则，更复杂的建议用 Gitleaks)
-    r"api_key",
-    r"secret",
-    r"password",
-    r"token",
-    r"auth",
-    r"credential",
-    r"private_key",
+    "credential": [
+        r"api_key",
+        r"secret",
+        r"password",
+        r"token",
+        r"auth",
+        r"credential",
+        r"private_key",
+    ],
     # 网络/请求
-    r"requests\.get",
-    r"requests\.post",
-    r"urllib",
-    r"socket",
+    "network": [
+        r"requests\.get",
+        r"requests\.post",
+        r"urllib",
+        r"socket",
+    ],
     # 文件操作
-    r"open\(",
-    r"write\(",
-    r"read\(",
+    "file_io": [
+        r"open\(",
+        r"write\(",
+        r"read\(",
+    ],
     # 常见漏洞点
-    r"noqa",  # 试图绕过 lint 的地方通常有猫腻
-    r"TODO",
-    r"FIXME",  # 开发者留下的坑
+    "marker": [
+        r"noqa",  # 试图绕过 lint 的地方通常有猫腻
+        r"TODO",
+        r"FIXME",  # 开发者留下的坑
+    ],
+}
+
+SENSITIVE_PATTERNS = [
+    pattern for patterns in SENSITIVE_PATTERN_GROUPS.values() for pattern in patterns
 ]
 
+# 所有规则合并为一个带命名分组的正则，一次扫描即可找到全部命中
+_PATTERN_CATEGORIES = [
+    category
+    for category, patterns in SENSITIVE_PATTERN_GROUPS.items()
+    for _ in patterns
+]
+_SENSITIVE_SCANNER = re.compile(
+    "|".join(f"(?P<p{i}>{pattern})" for i, pattern in enumerate(SENSITIVE_PATTERNS)),
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class SecurityScanResult:
+    """一次安全启发式扫描的结果"""
+
+    # 类别 -> 命中的行号（从 1 开始，去重且有序）
+    categories: Dict[str, List[int]] = field(default_factory=dict)
+    # 命中的规则
+    patterns: List[str] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.categories)
+
+
+def scan_security_heuristics(code: str) -> SecurityScanResult:
+    """
+    单次扫描代码，找出所有命中的敏感类别及其行号。
+
+    所有规则合并为一个正则扫描，每处匹配只归属于第一个命中的规则，
+    与之重叠的其他规则不会再被记录。
+    因此 `patterns` 与命中统计都是按「首个命中的规则」计数的。
+    Returns: SecurityScanResult，未命中时为空（布尔值为 False）
+    """
+    result = SecurityScanResult()
+    line_starts = None
+    seen_patterns = set()
+
+    for match in _SENSITIVE_SCANNER.finditer(code):
+        index = int(match.lastgroup[1:])
+        category = _PATTERN_CATEGORIES[index]
+
+        if line_starts is None:
+            # 只有命中时才建立行号索引
+            line_starts = [0] + [m.end() for m in re.finditer("\n", code)]
+        line = bisect_right(line_starts, match.start())
+
+        lines = result.categories.setdefault(category, [])
+        if not lines or lines[-1] != line:
+            lines.append(line)
+        if index not in seen_patterns:
+            seen_patterns.add(index)
+            result.patterns.append(SENSITIVE_PATTERNS[index])
+
+    return result
+
 
 def check_security_heuristics(code: str) -> bool:
     """
     检查代码是否包含敏感模式。
     Returns: True if sensitive pattern found.
     """
-    for pattern in SENSITIVE_PATTERNS:
-        if re.search(pattern, code, re.IGNORECASE):
-            return True
-    return False
+    return bool(scan_security_heuristics(code))
+
+
+def format_security_stats(stats: Counter, top: int = 10) -> str:
+    """返回保留代码块最多的前 `top` 条安全规则（按首个命中的规则计数）"""
+    lines = [f"  {pattern}: {count}" for pattern, count in stats.most_common(top)]
+    return "安全规则命中统计 (保留的代码块数):\n" + "\n".join(lines)
+
+
+def function_complexities(
+    node: Node,
+    file_extension: str,
+    exclude: Collection[int] = (),
+    byte_range: Optional[Tuple[int, int]] = None,
+) -> List[int]:
+    """
+    基于 tree-sitter 语法树计算 node 子树内每个函数的圈复杂度。
+
+    每个函数的复杂度 = 1 + 函数体内分支 token（if/for/while/case/&&/|| 等）的数量，
+    嵌套函数单独计数，不计入外层函数。
+
+    Args:
+        node (Node): 语法树节点（整个文件或某个代码块）
+        file_extension (str): 文件后缀名，用于确定语言配置
+        exclude (Collection[int]): 跳过的子树（节点 ID），分层切分时为已单独成块的嵌套定义
+        byte_range (Tuple[int, int]): 只统计与该字节区间重叠的部分，用于超限节点拆分出的片段
+    Returns:
+        List[int]: 子树内各函数的圈复杂度；语言不支持或没有函数时返回空列表
+    """
+    config = get_language_config(file_extension)
+    if not config or "function_nodes" not in config:
+        return []
+
+    function_nodes = config["function_nodes"]
+    branch_tokens = config["branch_tokens"]
+
+    scores: List[int] = []
+    stack = [(node, None)]
+    while stack:
+        current, owner = stack.pop()
+        if current.id in exclude:
+            continue
+        if byte_range and (
+            current.end_byte <= byte_range[0] or current.start_byte >= byte_range[1]
+        ):
+            continue
+        if current.type in function_nodes:
+            scores.append(1)
+            owner = len(scores) - 1
+        elif (
+            owner is not None and not current.is_named and current.type in branch_tokens
+        ):
+            scores[owner] += 1
+        stack.extend((child, owner) for child in current.children)
+    return scores
+
+
+def tree_complexity(
+    node: Node,
+    file_extension: str,
+    exclude: Collection[int] = (),
+    byte_range: Optional[Tuple[int, int]] = None,
+) -> int:
+    """返回 node 子树内函数的最大圈复杂度，没有函数时返回 0"""
+    scores = function_complexities(node, file_extension, exclude, byte_range)
+    return max(scores) if scores else 0
+
+
+def chunk_complexity(code: str, file_extension: str) -> int:
+    """
+    解析单个代码块并返回其中函数的最大圈复杂度。
+
+    tree-sitter 对不完整的片段有容错能力（生成 ERROR 节点而不是抛异常），
+    因此切分出的片段也能正常统计，不会像 lizard 那样频繁落入 analysis_error。
+    语言不支持或没有函数时返回 0。
+    """
+    parsed = parse_code(code, file_extension)
+    if parsed is None:
+        return 0
+    tree, _ = parsed
+    return tree_complexity(tree.root_node, file_extension)
 
 
-def filter_documents_l1(docs: List[Document], threshold: int = 5) -> List[Document]:
+def filter_documents_l1(
+    docs: List[Document], threshold: int = 5, stats: Optional[Counter] = None
+) -> List[Document]:
     """
     L1 层过滤器：基于复杂度 + 安全启发式规则。
 
     保留条件 (满足任一即可):
     1. 圈复杂度 (CCN) >= threshold (逻辑复杂)
     2. 命中敏感关键词 (可能存在安全风险)
+
+    圈复杂度基于 tree-sitter 的分支 token 计数（见 LANGUAGE_CONFIG 的 branch_tokens）。
+    如果代码块带有单次解析分析流程预先计算的 `ccn` 元数据，则直接使用，不再重复解析。
+
+    Args:
+        stats: 累计每条安全规则保留的代码块数。由调用方传入时（例如流式流水线跨批次累计）
+            不在这里打印，否则每次调用单独统计并打印
     """
+    report_stats = stats is None
+    if stats is None:
+        stats = Counter()
     kept_docs = []
     dropped_count = 0
 
@@ -74,44 +242,51 @@ def filter_documents_l1(docs: List[Document], threshold: int = 5) -> List[Docume
         source = doc.metadata.get("source", "unknown")
 
         # 1. 安全旁路检查 (Security Bypass)
-        if check_security_heuristics(code):
+        scan = scan_security_heuristics(code)
+        if scan:
             doc.metadata["keep_reason"] = "security_heuristic"
+            # 元数据只能存标量，类别用逗号拼接；L3 排序直接使用，无需重新扫描
+            doc.metadata["security_categories"] = ",".join(scan.categories)
+            doc.metadata["security_score"] = len(scan.categories)
+            doc.metadata["security_lines"] = ",".join(
+                str(line) for line in sorted(set(sum(scan.categories.values(), [])))
+            )
+            stats.update(scan.patterns)
             kept_docs.append(doc)
             continue
 
         # 2. 复杂度检查 (Complexity Check)
         try:
-            # lizard 分析需要文件名（用于推断语言）和代码内容
-            analysis = lizard.analyze_file.analyze_source_code(source, code)
-
-            # 如果没有函数（全是全局变量或类属性），lizard 返回空列表
-            if not analysis.function_list:
-                # 如果代码很长但没函数，可能是一大坨配置或脚本，保留
-                if len(code) > 500:
-                    doc.metadata["keep_reason"] = "length"
-                    kept_docs.append(doc)
-                else:
-                    dropped_count += 1
-                continue
-
-            # 获取最大复杂度
-            max_ccn = max(
-                [func.cyclomatic_complexity for func in analysis.function_list]
-            )
+            # 优先使用单次解析分析流程预先计算的值，否则用 tree-sitter 解析代码块
+            max_ccn = doc.metadata.get("ccn")
+            if max_ccn is None:
+                max_ccn = chunk_complexity(code, get_extension(source))
+        except Exception as e:
+            # 分析出错，保守起见保留
+            print(f"复杂度分析失败 ({source}): {e}")
+            doc.metadata["keep_reason"] = "analysis_error"
+            kept_docs.append(doc)
+            continue
 
-            if max_ccn >= threshold:
-                doc.metadata["complexity"] = max_ccn
-                doc.metadata["keep_reason"] = "high_complexity"
+        # 如果没有函数（全是全局变量或类属性）
+        if max_ccn == 0:
+            # 如果代码很长但没函数，可能是一大坨配置或脚本，保留
+            if len(code) > 500:
+                doc.metadata["keep_reason"] = "length"
                 kept_docs.append(doc)
             else:
                 dropped_count += 1
+            continue
 
-        except Exception as e:
-            # 分析出错（可能是片段不完整），保守起见保留
-            print(f"Lizard 分析失败 ({source}): {e}")
-            doc.metadata["keep_reason"] = "analysis_error"
+        if max_ccn >= threshold:
+            doc.metadata["complexity"] = max_ccn
+            doc.metadata["keep_reason"] = "high_complexity"
             kept_docs.append(doc)
+        else:
+            dropped_count += 1
 
+    if report_stats and stats:
+        print(format_security_stats(stats))
     print(
         f"L1 过滤结束: 保留 {len(kept_docs)} 个, 丢弃 {dropped_count} 个 (保留率 {len(kept_docs)/len(docs):.1%})"
     )
@@ -1,5 +1,5 @@
 # src/ingestion/filters.py
-from typing import List, Tuple
+from typing import List, Sequence, Tuple
 from langchain_core.documents import Document
 import re
 
@@ -49,6 +49,88 @@ TEST_PATTERNS = [
 ]
 
 
+# 只由普通字符和转义的符号组成（可以带结尾的 `$`）的规则可以退化为字符串匹配
+_LITERAL_PATTERN = re.compile(r"^(?:[^\\.^$*+?()\[\]{}|]|\\[^A-Za-z0-9])*\$?$")
+
+
+class _CompiledRule:
+    """
+    一类 L0 规则的预编译结果。
+
+    纯字面量规则（目前的规则全部属于此类）拆成「子串表 + 后缀表」，
+    用 `in` / `str.endswith(tuple)` 在 C 层完成匹配；其余规则合并为一个 alternation 正则。
+    """
+
+    def __init__(self, patterns: Sequence[str]):
+        substrings = []
+        suffixes = []
+        regexes = []
+        for pattern in patterns:
+            if _LITERAL_PATTERN.match(pattern):
+                is_suffix = pattern.endswith("$") and not pattern.endswith("\\$")
+                body = pattern[:-1] if is_suffix else pattern
+                literal = re.sub(r"\\(.)", r"\1", body).lower()
+                (suffixes if is_suffix else substrings).append(literal)
+            else:
+                regexes.append(pattern)
+
+        self.substrings = tuple(substrings)
+        self.suffixes = tuple(suffixes)
+        self.regex = (
+            re.compile("|".join(f"(?:{p})" for p in regexes), re.IGNORECASE)
+            if regexes
+            else None
+        )
+
+    def matches(self, lowered_path: str) -> bool:
+        if self.suffixes and lowered_path.endswith(self.suffixes):
+            return True
+        for substring in self.substrings:
+            if substring in lowered_path:
+                return True
+        return bool(self.regex and self.regex.search(lowered_path))
+
+
+class PathClassifier:
+    """
+    L0 路径分类器：所有规则在初始化时预编译一次。
+
+    每个路径只转换一次小写，然后按 噪音 -> 上下文 -> 测试 的优先级匹配，
+    不再对 ~30 条规则逐条调用 re.search。
+    """
+
+    def __init__(
+        self,
+        ignore_patterns: Sequence[str] = IGNORE_PATTERNS,
+        context_patterns: Sequence[str] = CONTEXT_PATTERNS,
+        test_patterns: Sequence[str] = TEST_PATTERNS,
+    ):
+        # 顺序即优先级，与 filter_documents_l0 原有的判断顺序一致
+        self._rules = [
+            ("ignore", _CompiledRule(ignore_patterns)),
+            ("context", _CompiledRule(context_patterns)),
+            ("test", _CompiledRule(test_patterns)),
+        ]
+
+    def classify(self, path: str) -> str:
+        """
+        Returns:
+            str: "ignore" / "context" / "test" / "core"
+        """
+        lowered_path = path.lower()
+        for category, rule in self._rules:
+            if rule.matches(lowered_path):
+                return category
+        return "core"
+
+    def should_fetch(self, path: str) -> bool:
+        """下载文件内容之前判断是否需要下载（噪音文件直接跳过）"""
+        return self.classify(path) != "ignore"
+
+
+DEFAULT_CLASSIFIER = PathClassifier()
+
+
 def filter_documents_l0(
     documents: List[Document],
 ) -> Tuple[List[Document], List[Document]]:
@@ -66,24 +148,21 @@ def filter_documents_l0(
 
     for doc in documents:
         source = doc.metadata.get("source", "")
+        category = DEFAULT_CLASSIFIER.classify(source)
 
         # 1. 检查是否为噪音 -> 丢弃
-        if any(
-            re.search(pattern, source, re.IGNORECASE) for pattern in IGNORE_PATTERNS
-        ):
+        if category == "ignore":
             continue
 
         # 2. 检查是否为上下文文件 -> 归入 context_docs
-        if any(
-            re.search(pattern, source, re.IGNORECASE) for pattern in CONTEXT_PATTERNS
-        ):
+        if category == "context":
             doc.metadata["category"] = "context"
             context_docs.append(doc)
             continue
 
         # 3. 检查是否为测试文件 -> 归入 context_docs (或者你可以决定归入 core 但标记低优先级)
         # 这里我们采纳你的建议：作为上下文保留，不深度审查
-        if any(re.search(pattern, source, re.IGNORECASE) for pattern in TEST_PATTERNS):
+        if category == "test":
             doc.metadata["category"] = "test"
             context_docs.append(doc)
             continue
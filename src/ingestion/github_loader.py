@@ -1,7 +1,12 @@
 from langchain_community.document_loaders import GithubFileLoader
 from langchain_core.documents import Document
-from typing import List, Dict
+from typing import Iterator, List, Dict, Optional, Tuple
 from src.ingestion.tree_sitter import Splitter_with_treeSitter
+from src.ingestion.analysis import analyze_documents
+from src.ingestion.filters import DEFAULT_CLASSIFIER
+from src.ingestion.manifest import IndexManifest
+from src.ingestion.parallel import map_documents_parallel
+from concurrent.futures import ProcessPoolExecutor
 from src.config import settings
 
 
@@ -24,20 +29,14 @@ SUPPORTED_EXTENSIONS = (
 )
 
 
-def ingest_repo(repo_name: str, branch: str = "main") -> List[Document]:
-    """
-    加载 GitHub 仓库并按语言使用 tree-sitter 切分文件。
-
-    Args:
-        repo_name: 仓库全名，例如 "langchain-ai/langchain"
-        branch: 分支名称，默认为 "main"
+def _should_fetch(file_path: str) -> bool:
+    """只下载受支持的文件类型，L0 噪音文件（node_modules、锁文件等）在下载前就跳过"""
+    return file_path.endswith(SUPPORTED_EXTENSIONS) and DEFAULT_CLASSIFIER.should_fetch(
+        file_path
+    )
 
-    Returns:
-        List[Document]: 切分后的文档列表
 
-    Raises:
-        ValueError: 当 Token 缺失或仓库名格式错误时抛出
-    """
+def _make_loader(repo_name: str, branch: str) -> GithubFileLoader:
     token = settings.GITHUB_TOKEN
     if not token:
         raise ValueError(
@@ -47,33 +46,106 @@ def ingest_repo(repo_name: str, branch: str = "main") -> List[Document]:
     if "/" not in repo_name:
         raise ValueError(f"无效的仓库名 '{repo_name}'。格式应为 'owner/repo'。")
 
-    loader = GithubFileLoader(
+    return GithubFileLoader(
         repo=repo_name,
         access_token=settings.GITHUB_TOKEN,
         github_api_url="https://api.github.com",
-        file_filter=lambda file_path: file_path.endswith(
-            SUPPORTED_EXTENSIONS
-        ),  # 只读指定类型的文件
+        file_filter=_should_fetch,  # 只读指定类型的文件
         branch=branch,
     )
 
-    documents = loader.load()
+
+def iter_repo(
+    repo_name: str, branch: str = "main", manifest: Optional[IndexManifest] = None
+) -> Iterator[Document]:
+    """
+    逐个下载 GitHub 仓库文件并产出 Document（流式，调用方取一个才下载一个）。
+
+    Args:
+        repo_name: 仓库全名，例如 "langchain-ai/langchain"
+        branch: 分支名称，默认为 "main"
+        manifest: 增量索引清单。传入时只下载新增或修改过的文件（按 blob SHA 判断）
+
+    Yields:
+        Document: 文件内容及 path/sha/source 元数据
+
+    Raises:
+        ValueError: 当 Token 缺失或仓库名格式错误时抛出
+    """
+    loader = _make_loader(repo_name, branch)
+
+    if manifest is None:
+        yield from loader.lazy_load()
+        return
+
+    # 文件树接口一次返回全部 blob SHA，无需下载内容即可判断是否变化
+    files = [f for f in loader.get_file_paths() if f["type"] == "blob"]
+    diff = manifest.diff(repo_name, branch, {f["path"]: f["sha"] for f in files})
+    changed = diff.changed
+
+    for file in files:
+        if file["path"] not in changed:
+            continue
+        content = loader.get_file_content_by_path(file["path"])
+        if content == "":
+            continue
+        metadata = {
+            "path": file["path"],
+            "sha": file["sha"],
+            "source": f"{loader.github_api_url}/{repo_name}/{file['type']}/"
+            f"{branch}/{file['path']}",
+        }
+        yield Document(page_content=content, metadata=metadata)
+
+
+def ingest_repo(
+    repo_name: str, branch: str = "main", manifest: Optional[IndexManifest] = None
+) -> List[Document]:
+    """
+    加载 GitHub 仓库并按语言使用 tree-sitter 切分文件。
+
+    Args:
+        repo_name: 仓库全名，例如 "langchain-ai/langchain"
+        branch: 分支名称，默认为 "main"
+        manifest: 增量索引清单。传入时只下载新增或修改过的文件（按 blob SHA 判断）
+
+    Returns:
+        List[Document]: 切分后的文档列表
+
+    Raises:
+        ValueError: 当 Token 缺失或仓库名格式错误时抛出
+    """
+    documents = list(iter_repo(repo_name, branch, manifest))
     print(f"Loaded {len(documents)} documents")
     return documents
 
 
 def split_repo(
-    documents: List[Document], repo_name: str, branch: str
+    documents: List[Document],
+    repo_name: str,
+    branch: str,
+    workers: int = settings.SPLIT_WORKERS,
+    chunksize: int = settings.SPLIT_CHUNKSIZE,
+    executor: Optional[ProcessPoolExecutor] = None,
 ) -> List[Document]:
     """
     使用 tree-sitter 按语言结构切分代码文件。
     Args:
         documents (List[Document]): 待切分的文档列表
+        workers (int): 切分进程数，1 为串行，0 为使用全部 CPU 核
+        chunksize (int): 并行模式下每次派发给子进程的文档数
+        executor (ProcessPoolExecutor): 复用已有的进程池（流式流水线按批次调用时使用）
     Returns:
-        List[Document]: 切分后的文档列表
+        List[Document]: 切分后的文档列表（并行模式下顺序与串行一致）
     """
 
-    split_docs = Splitter_with_treeSitter(documents)
+    split_docs = map_documents_parallel(
+        Splitter_with_treeSitter,
+        documents,
+        workers=workers,
+        chunksize=chunksize,
+        executor=executor,
+    )
 
     for split in split_docs:
         split.metadata["repo_name"] = repo_name
@@ -81,3 +153,42 @@ def split_repo(
 
     print(f"Total splits generated: {len(split_docs)}")
     return split_docs
+
+
+def analyze_repo(
+    documents: List[Document],
+    repo_name: str,
+    branch: str,
+    workers: int = settings.SPLIT_WORKERS,
+    chunksize: int = settings.SPLIT_CHUNKSIZE,
+    executor: Optional[ProcessPoolExecutor] = None,
+) -> Tuple[List[Document], Dict[str, str]]:
+    """
+    单次解析分析核心代码：每个文件只解析一次，同时得到切分结果、L2 骨架和 L1 圈复杂度。
+    Args:
+        documents (List[Document]): 待分析的文档列表
+        workers (int): 进程数，1 为串行，0 为使用全部 CPU 核
+        chunksize (int): 并行模式下每次派发给子进程的文档数
+        executor (ProcessPoolExecutor): 复用已有的进程池（流式流水线按批次调用时使用）
+    Returns:
+        Tuple[List[Document], Dict[str, str]]: 切分后的文档列表（带 `ccn` 元数据）, source -> 代码骨架
+    """
+    analyses = map_documents_parallel(
+        analyze_documents,
+        documents,
+        workers=workers,
+        chunksize=chunksize,
+        executor=executor,
+    )
+
+    split_docs = []
+    skeletons = {}
+    for analysis in analyses:
+        for split in analysis.chunks:
+            split.metadata["repo_name"] = repo_name
+            split.metadata["branch"] = branch
+            split_docs.append(split)
+        skeletons[analysis.source] = analysis.skeleton
+
+    print(f"Total splits generated: {len(split_docs)}")
+    return split_docs, skeletons
@@ -1,4 +1,6 @@
-from tree_sitter import Language
+import threading
+from typing import Dict, Optional, Tuple
+from tree_sitter import Language, Parser, Query
 import tree_sitter_python
 import tree_sitter_javascript
 import tree_sitter_typescript
@@ -14,6 +16,8 @@ import tree_sitter_rust
 # 注意：不同语言的节点名称可能不同，需要针对性调整
 # 例如：Python用 function_definition, Java用 method_declaration
 # "skeleton_query" 为用于骨架提取的查询模式
+# "function_nodes" 为计算圈复杂度时作为独立函数统计的节点类型
+# "branch_tokens" 为每出现一次圈复杂度 +1 的关键字/运算符 token（与 lizard 的判定条件对齐）
 
 LANGUAGE_CONFIG = {
     ".py": {
@@ -26,6 +30,17 @@ LANGUAGE_CONFIG = {
             (function_definition body: (block) @body)
             (class_definition body: (block) @body)
         """,
+        "function_nodes": {"function_definition"},
+        "branch_tokens": {
+            "if",
+            "elif",
+            "for",
+            "while",
+            "except",
+            "finally",
+            "and",
+            "or",
+        },
     },
     ".js": {
         "lang": Language(tree_sitter_javascript.language()),
@@ -41,6 +56,14 @@ LANGUAGE_CONFIG = {
             (arrow_function body: (statement_block) @body)
             (method_definition body: (statement_block) @body)
         """,
+        "function_nodes": {
+            "function_declaration",
+            "function_expression",
+            "generator_function_declaration",
+            "method_definition",
+            "arrow_function",
+        },
+        "branch_tokens": {"if", "for", "while", "case", "catch", "?", "&&", "||"},
     },
     ".ts": {
         "lang": Language(tree_sitter_typescript.language_typescript()),
@@ -58,6 +81,14 @@ LANGUAGE_CONFIG = {
             (function_declaration body: (statement_block) @body)
             (arrow_function body: (statement_block) @body)
         """,
+        "function_nodes": {
+            "function_declaration",
+            "function_expression",
+            "generator_function_declaration",
+            "method_definition",
+            "arrow_function",
+        },
+        "branch_tokens": {"if", "for", "while", "case", "catch", "?", "&&", "||"},
     },
     ".java": {
         "lang": Language(tree_sitter_java.language()),
@@ -73,6 +104,8 @@ LANGUAGE_CONFIG = {
             (method_declaration body: (block) @body)
             (constructor_declaration body: (block) @body)
         """,
+        "function_nodes": {"method_declaration", "constructor_declaration"},
+        "branch_tokens": {"if", "for", "while", "case", "catch", "?", "&&", "||"},
     },
     ".go": {
         "lang": Language(tree_sitter_go.language()),
@@ -86,6 +119,8 @@ LANGUAGE_CONFIG = {
             (function_declaration body: (block) @body)
             (method_declaration body: (block) @body)
         """,
+        "function_nodes": {"function_declaration", "method_declaration"},
+        "branch_tokens": {"if", "for", "case", "&&", "||"},
     },
     ".rb": {
         "lang": Language(tree_sitter_ruby.language()),
@@ -100,6 +135,22 @@ LANGUAGE_CONFIG = {
             (method body: (_) @body)
             (singleton_method body: (_) @body)
         """,
+        "function_nodes": {"method", "singleton_method"},
+        "branch_tokens": {
+            "if",
+            "elsif",
+            "for",
+            "while",
+            "until",
+            "when",
+            "rescue",
+            "ensure",
+            "?",
+            "and",
+            "or",
+            "&&",
+            "||",
+        },
     },
     ".cpp": {
         "lang": Language(tree_sitter_cpp.language()),
@@ -114,6 +165,8 @@ LANGUAGE_CONFIG = {
             (struct_specifier body: (field_declaration_list) @body)
             (lambda_expression body: (compound_statement) @body)
         """,
+        "function_nodes": {"function_definition"},
+        "branch_tokens": {"if", "for", "while", "case", "catch", "?", "&&", "||"},
     },
     ".c": {
         "lang": Language(tree_sitter_c.language()),
@@ -126,6 +179,8 @@ LANGUAGE_CONFIG = {
             (struct_specifier body: (field_declaration_list) @body)
             (enum_specifier body: (enumerator_list) @body)
         """,
+        "function_nodes": {"function_definition"},
+        "branch_tokens": {"if", "for", "while", "case", "?", "&&", "||"},
     },
     ".cs": {
         "lang": Language(tree_sitter_c_sharp.language()),
@@ -142,6 +197,23 @@ LANGUAGE_CONFIG = {
             (struct_declaration body: (declaration_list) @body)
             (interface_declaration body: (declaration_list) @body)
         """,
+        "function_nodes": {
+            "method_declaration",
+            "constructor_declaration",
+            "local_function_statement",
+        },
+        "branch_tokens": {
+            "if",
+            "for",
+            "foreach",
+            "while",
+            "case",
+            "catch",
+            "?",
+            "??",
+            "&&",
+            "||",
+        },
     },
     ".rs": {
         "lang": Language(tree_sitter_rust.language()),
@@ -158,6 +230,8 @@ LANGUAGE_CONFIG = {
             (trait_item body: (declaration_list) @body)
             (mod_item body: (declaration_list) @body)
         """,
+        "function_nodes": {"function_item"},
+        "branch_tokens": {"if", "for", "while", "?", "&&", "||"},
     },
 }
 
@@ -165,3 +239,61 @@ LANGUAGE_CONFIG = {
 def get_language_config(file_extension: str):
     """获取指定文件后缀的语言配置"""
     return LANGUAGE_CONFIG.get(file_extension)
+
+
+# --- 编译缓存 (Registry) ---
+# Query 编译后只读，可以在线程间共享；Parser 带有解析状态，每个线程各持有一份。
+# 进程池中每个子进程会各自初始化一份缓存（模块级状态不会被 pickle）。
+_QUERY_CACHE: Dict[Tuple[str, str], Optional[Query]] = {}
+_QUERY_LOCK = threading.Lock()
+_thread_local = threading.local()
+
+
+def get_query(file_extension: str, kind: str = "query") -> Optional[Query]:
+    """
+    获取编译好的 tree-sitter 查询，每种语言的每类查询只编译一次。
+
+    Args:
+        file_extension: 文件后缀名，例如 ".py"
+        kind: LANGUAGE_CONFIG 中的查询类型，"query" 或 "skeleton_query"
+
+    Returns:
+        Optional[Query]: 编译好的查询；语言不支持或查询编译失败时返回 None
+    """
+    key = (file_extension, kind)
+    if key in _QUERY_CACHE:
+        return _QUERY_CACHE[key]
+
+    with _QUERY_LOCK:
+        if key not in _QUERY_CACHE:
+            config = get_language_config(file_extension)
+            query = None
+            if config and kind in config:
+                try:
+                    query = Query(config["lang"], config[kind])
+                except Exception as e:
+                    # 查询与语法版本不匹配时只记录一次，调用方走降级逻辑
+                    print(f"tree-sitter 查询编译失败 ({file_extension} {kind}): {e}")
+            _QUERY_CACHE[key] = query
+    return _QUERY_CACHE[key]
+
+
+def get_parser(file_extension: str) -> Optional[Parser]:
+    """获取当前线程复用的 Parser，语言不支持时返回 None"""
+    parsers = getattr(_thread_local, "parsers", None)
+    if parsers is None:
+        parsers = _thread_local.parsers = {}
+
+    if file_extension not in parsers:
+        config = get_language_config(file_extension)
+        parsers[file_extension] = Parser(config["lang"]) if config else None
+    return parsers[file_extension]
+
+
+def warm_up_registry() -> None:
+    """预编译所有语言的查询并创建当前线程的 Parser（用于进程池初始化）"""
+    for file_extension, config in LANGUAGE_CONFIG.items():
+        get_parser(file_extension)
+        for kind in ("query", "skeleton_query"):
+            if kind in config:
+                get_query(file_extension, kind)
@@ -0,0 +1,275 @@
+# src/ingestion/local_loader.py
+import hashlib
+import os
+import tarfile
+from typing import Dict, Iterator, List, Optional
+
+import git
+from langchain_core.documents import Document
+
+from src.ingestion.filters import DEFAULT_CLASSIFIER
+from src.ingestion.github_loader import SUPPORTED_EXTENSIONS
+from src.ingestion.manifest import IndexManifest
+
+
+def _github_source(repo_name: str, branch: str, path: str) -> str:
+    """生成与 GithubFileLoader 一致的 source 元数据，保证 L0/切分逻辑不受数据源影响"""
+    return f"https://api.github.com/{repo_name}/blob/{branch}/{path}"
+
+
+def _blob_sha(data: bytes) -> str:
+    """按 git 的规则计算 blob SHA（与 GitHub API 返回的 sha 一致）"""
+    header = f"blob {len(data)}\0".encode()
+    return hashlib.sha1(header + data).hexdigest()
+
+
+def _wanted(path: str) -> bool:
+    """受支持的文件类型，且不是 L0 噪音文件（读取内容之前判断）"""
+    return path.endswith(SUPPORTED_EXTENSIONS) and DEFAULT_CLASSIFIER.should_fetch(path)
+
+
+def _make_document(
+    data: bytes, path: str, sha: str, repo_name: str, branch: str
+) -> Optional[Document]:
+    try:
+        content = data.decode("utf-8")
+    except UnicodeDecodeError:
+        # 二进制文件或非 UTF-8 编码，直接跳过
+        return None
+
+    # 与 GithubFileLoader 保持一致：空文件不生成 Document
+    if not content:
+        return None
+
+    return Document(
+        page_content=content,
+        metadata={
+            "path": path,
+            "sha": sha,
+            "source": _github_source(repo_name, branch, path),
+        },
+    )
+
+
+def _iter_git_tree(
+    repo: git.Repo,
+    repo_name: str,
+    branch: str,
+    known_shas: Dict[str, str],
+    listing: Dict[str, str],
+) -> Iterator[Document]:
+    """直接从 git 对象库读取某个分支的全部文件（适用于普通 clone 和 bare clone）"""
+    tree = repo.commit(branch).tree
+    for item in tree.traverse():
+        if item.type != "blob" or not _wanted(item.path):
+            continue
+        listing[item.path] = item.hexsha
+        # blob SHA 未变，连内容都不用读
+        if known_shas.get(item.path) == item.hexsha:
+            continue
+        # data_stream 复用 gitpython 常驻的 `git cat-file --batch` 进程，不会逐个 fork
+        data = item.data_stream.read()
+        doc = _make_document(data, item.path, item.hexsha, repo_name, branch)
+        if doc:
+            yield doc
+
+
+def _iter_directory(
+    root: str,
+    repo_name: str,
+    branch: str,
+    known_shas: Dict[str, str],
+    listing: Dict[str, str],
+) -> Iterator[Document]:
+    """遍历普通目录（例如解压后的源码包）"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        # 跳过 .git 目录
+        dirnames[:] = sorted(d for d in dirnames if d != ".git")
+        for filename in sorted(filenames):
+            full_path = os.path.join(dirpath, filename)
+            rel_path = os.path.relpath(full_path, root).replace(os.sep, "/")
+            if not _wanted(rel_path):
+                continue
+            with open(full_path, "rb") as f:
+                data = f.read()
+            sha = _blob_sha(data)
+            listing[rel_path] = sha
+            if known_shas.get(rel_path) == sha:
+                continue
+            doc = _make_document(data, rel_path, sha, repo_name, branch)
+            if doc:
+                yield doc
+
+
+def _member_name(member: tarfile.TarInfo) -> str:
+    name = member.name
+    return name[2:] if name.startswith("./") else name
+
+
+def _archive_prefix(archive_path: str) -> str:
+    """
+    所有成员共享的顶级目录前缀（例如 GitHub 源码包的 `owner-repo-sha/`），没有时返回空串。
+
+    只读取成员头信息；任何成员不在同一个顶级目录下（或顶级就是文件）时立即停止。
+    """
+    top = None
+    with tarfile.open(archive_path, "r|*") as tar:
+        for member in tar:
+            name = _member_name(member)
+            if name == "pax_global_header":
+                continue
+            first, _, rest = name.rstrip("/").partition("/")
+            if top is None:
+                top = first
+            if first != top or (not rest and not member.isdir()):
+                return ""
+    return top + "/" if top else ""
+
+
+def _iter_tarball(
+    archive_path: str,
+    repo_name: str,
+    branch: str,
+    known_shas: Dict[str, str],
+    listing: Dict[str, str],
+) -> Iterator[Document]:
+    """以流模式读取 .tar.gz 归档（不落盘）。
+
+    GitHub 下载的源码包会带一层 `owner-repo-sha/` 顶级目录，这里会自动去掉；
+    只有所有成员都位于同一个顶级目录下时才视为归档前缀（见 `_archive_prefix`）。
+    """
+    prefix = _archive_prefix(archive_path)
+    with tarfile.open(archive_path, "r|*") as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+
+            name = _member_name(member)
+            if prefix and name.startswith(prefix):
+                name = name[len(prefix) :]
+            if not _wanted(name):
+                continue
+
+            f = tar.extractfile(member)
+            if f is None:
+                continue
+            data = f.read()
+            sha = _blob_sha(data)
+            listing[name] = sha
+            if known_shas.get(name) == sha:
+                continue
+            doc = _make_document(data, name, sha, repo_name, branch)
+            if doc:
+                yield doc
+
+
+def list_local_paths(path: str, branch: str = "main") -> List[str]:
+    """
+    列出本地数据源中所有文件的路径（不读取文件内容），与 `list_repo_paths` 的结果格式一致。
+    数据源类型的判断与 `iter_local_repo` 相同；无法识别时返回空列表。
+    """
+    if os.path.isfile(path):
+        if not tarfile.is_tarfile(path):
+            return []
+        prefix = _archive_prefix(path)
+        with tarfile.open(path, "r|*") as tar:
+            names = [_member_name(member) for member in tar if member.isfile()]
+        return [
+            name[len(prefix) :] if prefix and name.startswith(prefix) else name
+            for name in names
+        ]
+    if not os.path.isdir(path):
+        return []
+
+    try:
+        repo = git.Repo(path)
+    except (git.InvalidGitRepositoryError, git.NoSuchPathError):
+        repo = None
+    if repo is not None:
+        tree = repo.commit(branch).tree
+        return [item.path for item in tree.traverse() if item.type == "blob"]
+
+    paths = []
+    for dirpath, dirnames, filenames in os.walk(path):
+        dirnames[:] = sorted(d for d in dirnames if d != ".git")
+        for filename in sorted(filenames):
+            full_path = os.path.join(dirpath, filename)
+            paths.append(os.path.relpath(full_path, path).replace(os.sep, "/"))
+    return paths
+
+
+def iter_local_repo(
+    path: str,
+    repo_name: str,
+    branch: str = "main",
+    manifest: Optional[IndexManifest] = None,
+) -> Iterator[Document]:
+    """
+    从本地数据源批量读取仓库文件，逐个产出 Document。
+
+    支持三种数据源:
+        1. git 仓库（普通 clone 或 bare clone）：读取 `branch` 对应提交的文件
+        2. 普通目录：直接遍历文件系统
+        3. .tar.gz / .tar 归档：流式解压读取
+
+    Args:
+        path: 本地路径
+        repo_name: 仓库全名，例如 "langchain-ai/langchain"，用于生成 source 元数据
+        branch: 分支名称
+        manifest: 增量索引清单。传入时只产出新增或修改过的文件，
+            遍历结束后自动调用 `manifest.diff()` 暂存差异（包括已删除的文件）
+
+    Yields:
+        Document: 与 GithubFileLoader 元数据格式一致的文档
+
+    Raises:
+        ValueError: 当路径不存在或无法识别数据源类型时抛出
+    """
+    known_shas = manifest.file_shas(repo_name, branch) if manifest else {}
+    listing: Dict[str, str] = {}
+
+    if os.path.isfile(path):
+        if not tarfile.is_tarfile(path):
+            raise ValueError(f"无法识别的归档文件 '{path}'，仅支持 tar/tar.gz 格式。")
+        yield from _iter_tarball(path, repo_name, branch, known_shas, listing)
+    elif not os.path.isdir(path):
+        raise ValueError(f"本地路径 '{path}' 不存在。")
+    else:
+        try:
+            repo = git.Repo(path)
+        except (git.InvalidGitRepositoryError, git.NoSuchPathError):
+            repo = None
+
+        if repo is not None:
+            yield from _iter_git_tree(repo, repo_name, branch, known_shas, listing)
+        else:
+            yield from _iter_directory(path, repo_name, branch, known_shas, listing)
+
+    if manifest is not None:
+        manifest.diff(repo_name, branch, listing)
+
+
+def ingest_local_repo(
+    path: str,
+    repo_name: str,
+    branch: str = "main",
+    manifest: Optional[IndexManifest] = None,
+) -> List[Document]:
+    """
+    从本地 checkout / bare clone / 源码包一次性加载仓库，替代逐文件请求 GitHub API。
+
+    Args:
+        path: 本地路径
+        repo_name: 仓库全名，例如 "langchain-ai/langchain"
+        branch: 分支名称，默认为 "main"
+        manifest: 增量索引清单。传入时只加载新增或修改过的文件
+
+    Returns:
+        List[Document]: 加载的文档列表
+    """
+    if "/" not in repo_name:
+        raise ValueError(f"无效的仓库名 '{repo_name}'。格式应为 'owner/repo'。")
+
+    documents = list(iter_local_repo(path, repo_name, branch, manifest))
+    print(f"Loaded {len(documents)} documents from {path}")
+    return documents
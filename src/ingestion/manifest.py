@@ -0,0 +1,142 @@
+# src/ingestion/manifest.py
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+from src.config import settings
+
+
+@dataclass
+class ManifestDiff:
+    """一次增量索引中，当前仓库快照与上次索引结果的差异"""
+
+    added: List[str] = field(default_factory=list)
+    modified: List[str] = field(default_factory=list)
+    deleted: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+
+    @property
+    def changed(self) -> set:
+        """需要重新下载、切分、入库的文件"""
+        return set(self.added) | set(self.modified)
+
+
+class IndexManifest:
+    """
+    增量索引清单：(repo, branch, path) -> blob SHA -> chunk IDs。
+
+    使用方式分两步:
+        1. `diff()`：加载阶段用当前文件列表与清单比对，暂存差异
+        2. `commit()`：入库成功后写入新的 SHA 与 chunk ID，并落盘
+
+    入库失败时不调用 commit，清单保持上一次成功的状态，下次运行会重新处理这些文件。
+    """
+
+    def __init__(self, path: str = settings.MANIFEST_PATH):
+        self.path = path
+        self._data: Dict[str, Dict[str, Dict]] = {}
+        self._staged: Dict[str, Tuple[Dict[str, str], ManifestDiff]] = {}
+
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self._data = json.load(f)
+
+    @staticmethod
+    def _key(repo_name: str, branch: str) -> str:
+        return f"{repo_name}@{branch}"
+
+    def file_shas(self, repo_name: str, branch: str) -> Dict[str, str]:
+        """返回上次索引时各文件的 blob SHA"""
+        files = self._data.get(self._key(repo_name, branch), {})
+        return {path: entry["sha"] for path, entry in files.items()}
+
+    def forget(self, repo_name: str, branch: str) -> None:
+        """删除 repo@branch 的全部记录并落盘，下次 `diff()` 时所有文件都视为新增"""
+        if self._data.pop(self._key(repo_name, branch), None) is not None:
+            self.save()
+
+    def diff(
+        self, repo_name: str, branch: str, current_shas: Dict[str, str]
+    ) -> ManifestDiff:
+        """
+        比对当前文件列表与清单，并暂存结果供 `stale_chunk_ids()` / `commit()` 使用。
+
+        Args:
+            current_shas: 当前分支上所有受支持文件的 path -> blob SHA
+
+        Returns:
+            ManifestDiff: 新增、修改、删除、未变的文件路径
+        """
+        previous = self.file_shas(repo_name, branch)
+        diff = ManifestDiff()
+
+        for path, sha in current_shas.items():
+            if path not in previous:
+                diff.added.append(path)
+            elif previous[path] != sha:
+                diff.modified.append(path)
+            else:
+                diff.unchanged.append(path)
+        diff.deleted = [path for path in previous if path not in current_shas]
+
+        self._staged[self._key(repo_name, branch)] = (dict(current_shas), diff)
+        print(
+            f"增量索引 ({repo_name}@{branch}): 新增 {len(diff.added)}, 修改 {len(diff.modified)}, "
+            f"删除 {len(diff.deleted)}, 未变 {len(diff.unchanged)}"
+        )
+        return diff
+
+    def stale_paths(self, repo_name: str, branch: str) -> List[str]:
+        """返回暂存差异中被修改或删除的文件"""
+        staged = self._staged.get(self._key(repo_name, branch))
+        if staged is None:
+            return []
+        _, diff = staged
+        return diff.modified + diff.deleted
+
+    def stale_chunk_ids(self, repo_name: str, branch: str) -> List[str]:
+        """返回被修改或删除的文件在向量库中的旧 chunk ID"""
+        files = self._data.get(self._key(repo_name, branch), {})
+        stale = []
+        for path in self.stale_paths(repo_name, branch):
+            stale.extend(files.get(path, {}).get("chunk_ids", []))
+        return stale
+
+    def commit(
+        self, repo_name: str, branch: str, chunk_ids_by_path: Dict[str, List[str]]
+    ) -> None:
+        """
+        将暂存的差异写入清单并落盘。
+
+        Args:
+            chunk_ids_by_path: 本次入库的文件 path -> 新的 chunk ID 列表。
+                被 L0 过滤掉（没有产生 chunk）的文件也会记录 SHA，下次直接跳过。
+        """
+        key = self._key(repo_name, branch)
+        if key not in self._staged:
+            raise ValueError(f"{key} 没有暂存的差异，请先调用 diff()。")
+
+        current_shas, diff = self._staged.pop(key)
+        files = self._data.setdefault(key, {})
+
+        for path in diff.deleted:
+            files.pop(path, None)
+        for path in diff.changed:
+            files[path] = {
+                "sha": current_shas[path],
+                "chunk_ids": chunk_ids_by_path.get(path, []),
+            }
+
+        self.save()
+
+    def save(self) -> None:
+        """原子写入清单文件"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
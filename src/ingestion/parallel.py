@@ -0,0 +1,72 @@
+# src/ingestion/parallel.py
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Optional, TypeVar
+
+from langchain_core.documents import Document
+
+from src.ingestion.language import warm_up_registry
+
+T = TypeVar("T")
+
+
+def _init_worker() -> None:
+    """子进程初始化：预编译查询、创建 Parser，之后每个分片都复用"""
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    warm_up_registry()
+
+
+def create_executor(workers: Optional[int] = None) -> Optional[ProcessPoolExecutor]:
+    """
+    创建一个可在多次调用间复用的进程池（例如流式流水线的每个批次）。
+
+    Returns:
+        Optional[ProcessPoolExecutor]: workers <= 1 时返回 None，表示串行执行
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1:
+        return None
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+
+
+def map_documents_parallel(
+    func: Callable[[List[Document]], List[T]],
+    documents: List[Document],
+    workers: Optional[int] = None,
+    chunksize: int = 64,
+    executor: Optional[ProcessPoolExecutor] = None,
+) -> List[T]:
+    """
+    将文档按 `chunksize` 分片后交给进程池处理，并按原顺序拼接结果。
+
+    Args:
+        func: 处理一个分片的函数（必须是模块级函数，才能被 pickle）
+        documents: 待处理的文档列表
+        workers: 进程数，默认为 CPU 核数；<= 1 时直接在当前进程串行执行
+        chunksize: 每次派发给子进程的文档数量，过小会让 IPC 开销抵消并行收益
+        executor: 复用已有的进程池（由 `create_executor` 创建），传入时忽略 workers
+
+    Returns:
+        List[T]: 与串行执行 `func(documents)` 顺序一致的结果
+    """
+    shards = [documents[i : i + chunksize] for i in range(0, len(documents), chunksize)]
+
+    results: List[T] = []
+    if executor is not None:
+        if len(shards) <= 1:
+            return func(documents)
+        # executor.map 保证结果顺序与输入一致
+        for shard_result in executor.map(func, shards):
+            results.extend(shard_result)
+        return results
+
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(shards) <= 1:
+        return func(documents)
+
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(shards)), initializer=_init_worker
+    ) as executor:
+        for shard_result in executor.map(func, shards):
+            results.extend(shard_result)
+    return results
@@ -0,0 +1,220 @@
+# src/ingestion/streaming.py
+from collections import Counter
+import json
+import os
+import sqlite3
+import tempfile
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from src.config import settings
+from src.ingestion.complexity import filter_documents_l1, format_security_stats
+from src.ingestion.filters import filter_documents_l0
+from src.ingestion.github_loader import analyze_repo, split_repo
+from src.ingestion.manifest import IndexManifest
+from src.ingestion.parallel import create_executor
+from src.rag.definition_index import DefinitionIndex
+from src.rag.vectorstore import add_chunks, finalize_index, reset_embedding_stats
+
+
+class StreamResult:
+    """
+    流式流水线跑完后留给 L2/L3 的结果（不包含任何完整文件内容）。
+
+    关键代码块与其所在文件的骨架在处理过程中逐批写入磁盘上的临时 SQLite 文件，
+    不随仓库大小常驻内存；L2/L3 开始前通过 `load_*` 读回。用完后调用 `close()` 删除临时文件。
+    """
+
+    def __init__(self, directory: str = settings.STREAM_SPILL_DIR):
+        os.makedirs(directory, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(
+            prefix="stream-", suffix=".sqlite", dir=directory
+        )
+        os.close(fd)
+        self.files = 0
+        self.chunks = 0
+        self.critical = 0
+
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute(
+            "CREATE TABLE chunks (row INTEGER PRIMARY KEY, "
+            "content TEXT NOT NULL, metadata TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE skeletons (source TEXT PRIMARY KEY, skeleton TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+    def add_critical(self, chunks: List[Document], skeletons: Dict[str, str]) -> None:
+        """写入一批关键代码块及其所在文件的骨架"""
+        self._conn.executemany(
+            "INSERT INTO chunks (content, metadata) VALUES (?, ?)",
+            [
+                (doc.page_content, json.dumps(doc.metadata, ensure_ascii=False))
+                for doc in chunks
+            ],
+        )
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO skeletons VALUES (?, ?)", skeletons.items()
+        )
+        self._conn.commit()
+        self.critical += len(chunks)
+
+    def load_critical_chunks(self) -> List[Document]:
+        """L1 筛选出的关键代码块（按写入顺序）"""
+        return [
+            Document(page_content=content, metadata=json.loads(metadata))
+            for content, metadata in self._conn.execute(
+                "SELECT content, metadata FROM chunks ORDER BY row"
+            )
+        ]
+
+    def load_skeletons(self) -> Dict[str, str]:
+        """关键代码所在文件的 source -> 代码骨架"""
+        return dict(self._conn.execute("SELECT source, skeleton FROM skeletons"))
+
+    def load_l2_candidates(self) -> List[Document]:
+        """L2 候选文件的占位 Document：只有 source 元数据，摘要使用骨架"""
+        return [
+            Document(page_content="", metadata={"source": source})
+            for (source,) in self._conn.execute(
+                "SELECT source FROM skeletons ORDER BY source"
+            )
+        ]
+
+    def close(self) -> None:
+        self._conn.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _batched(documents: Iterable[Document], size: int) -> Iterator[List[Document]]:
+    iterator = iter(documents)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def stream_pipeline(
+    documents: Iterable[Document],
+    repo_name: str,
+    branch: str,
+    vector_store: VectorStore,
+    manifest: Optional[IndexManifest] = None,
+    max_in_flight: int = settings.STREAM_MAX_IN_FLIGHT,
+    threshold: int = 10,
+    workers: int = settings.SPLIT_WORKERS,
+    chunksize: int = settings.SPLIT_CHUNKSIZE,
+    definition_index: Optional[DefinitionIndex] = None,
+) -> StreamResult:
+    """
+    内存有界的流式流水线：ingest -> L0 -> 切分 -> L1 -> embed 按批次流动。
+
+    `documents` 应当是惰性的生成器（`iter_repo` / `iter_local_repo`）。每次只从上游拉取
+    `max_in_flight` 个文件，处理并写入向量库后才拉取下一批，上游在此期间不会继续读取，
+    形成天然的背压。批次处理完后完整文件内容即被释放，关键代码块与其所在文件的骨架
+    写入磁盘（见 `StreamResult`），因此峰值内存取决于批大小，而不是仓库大小。
+
+    上下文文件（配置、文档等）只写入向量库，不作为 L2 候选：L3 只使用关键代码所在文件的摘要。
+
+    仍随仓库大小增长的内存状态（只有 ID 和路径等小对象，不含代码内容）:
+        - 传入 manifest 时，本次写入的 chunk ID（按文件路径），流结束后提交清单需要
+        - manifest 与 definition_index 自身（分别记录所有文件的 SHA / 定义名）
+
+    Args:
+        documents: 惰性的文件流
+        repo_name: 仓库全名
+        branch: 分支名称
+        vector_store: 向量库实例
+        manifest: 增量索引清单；传入时流结束后删除过期 chunk 并提交清单
+        max_in_flight: 同时驻留在内存中的最大文件数
+        threshold: L1 圈复杂度阈值
+        workers: 切分进程数，进程池在整个流中复用
+        chunksize: 每次派发给子进程的文档数
+        definition_index: 符号定义索引；传入时记录每批写入的定义 chunk
+
+    Returns:
+        StreamResult: 供 L2/L3 使用的结果，用完后需要调用 `close()`
+    """
+    result = StreamResult()
+    chunk_ids_by_path: Dict[str, List[str]] = {}
+    # 安全规则命中统计只在本次流水线内跨批次累计
+    security_stats: Counter = Counter()
+    reset_embedding_stats(vector_store)
+    executor = create_executor(workers)
+
+    try:
+        for batch in _batched(documents, max_in_flight):
+            result.files += len(batch)
+
+            # L0 过滤文件
+            core_docs, context_docs = filter_documents_l0(batch)
+
+            # 切分：核心代码走单次解析流程，同时得到复杂度与骨架
+            core_chunks, core_skeletons = analyze_repo(
+                core_docs,
+                repo_name,
+                branch,
+                workers=workers,
+                chunksize=chunksize,
+                executor=executor,
+            )
+            context_chunks = split_repo(
+                context_docs,
+                repo_name,
+                branch,
+                workers=workers,
+                chunksize=chunksize,
+                executor=executor,
+            )
+
+            # embed 并写入向量库
+            chunks = core_chunks + context_chunks
+            # 没有清单时不需要在流结束后提交 ID，每批使用新的字典
+            ids = add_chunks(
+                vector_store,
+                chunks,
+                chunk_ids_by_path if manifest is not None else {},
+            )
+            result.chunks += len(ids)
+            if definition_index is not None:
+                definition_index.add(chunks, ids)
+
+            # L1 根据复杂度和正则得到核心代码
+            critical = (
+                filter_documents_l1(core_chunks, threshold, security_stats)
+                if core_chunks
+                else []
+            )
+            # L2 候选：关键代码所在的文件，只保留骨架；与关键代码块一起写入磁盘
+            critical_sources = {doc.metadata.get("source") for doc in critical}
+            result.add_critical(
+                critical,
+                {source: core_skeletons.get(source, "") for source in critical_sources},
+            )
+
+            print(
+                f"流式处理进度: 已处理 {result.files} 个文件, 写入 {result.chunks} 个 chunk, "
+                f"关键代码块 {result.critical} 个"
+            )
+    except BaseException:
+        result.close()
+        raise
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    if security_stats:
+        print(format_security_stats(security_stats))
+    if manifest is not None:
+        finalize_index(
+            vector_store,
+            manifest,
+            repo_name,
+            branch,
+            chunk_ids_by_path,
+            definition_index,
+        )
+    return result
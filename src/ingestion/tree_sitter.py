@@ -1,9 +1,457 @@
 # src/ingestion/tree_sitter_demo.py
-from typing import List
+import re
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
 from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from tree_sitter import Parser, Query, QueryCursor
-from src.ingestion.language import get_language_config
+from tree_sitter import Node, QueryCursor, Tree
+from src.config import settings
+from src.rag.tokens import count_tokens
+from src.ingestion.language import get_language_config, get_parser, get_query
+
+
+def get_extension(file_path: str) -> str:
+    """获取文件后缀名（包含 "."），没有后缀名时返回空字符串"""
+    if "." not in file_path:
+        # 没有后缀名的文件
+        # 如：Makefile Dockerfile LICENSE 以及一些linux下的可执行文件
+        return ""
+    return "." + file_path.split(".")[-1]
+
+
+def get_fallback_splitter() -> RecursiveCharacterTextSplitter:
+    """通用的 splitter，为 tree-sitter 不适用的文件切片"""
+    return RecursiveCharacterTextSplitter(chunk_size=2000, chunk_overlap=200)
+
+
+def parse_code(code: str, extension: str) -> Optional[Tuple[Tree, bytes]]:
+    """使用缓存的 Parser 解析代码，语言不支持时返回 None"""
+    parser = get_parser(extension)
+    if parser is None:
+        return None
+    code_bytes = bytes(code, "utf8")
+    return parser.parse(code_bytes), code_bytes
+
+
+@lru_cache(maxsize=None)
+def _definition_types(extension: str) -> FrozenSet[str]:
+    """切分查询中捕获的节点类型（类、函数等定义），用于拼接限定名"""
+    config = get_language_config(extension)
+    if not config:
+        return frozenset()
+    return frozenset(re.findall(r"\((\w+)\)\s*@", config["query"]))
+
+
+def _text(node: Node) -> str:
+    return node.text.decode("utf8", errors="replace")
+
+
+def definition_name(node: Node) -> Optional[str]:
+    """
+    获取定义节点（类、函数、方法等）的名字，匿名或无法识别时返回 None。
+    """
+    name = node.child_by_field_name("name")
+    if name is not None:
+        return _text(name)
+
+    if node.type == "impl_item":
+        # Rust: impl Foo / impl Trait for Foo
+        impl_type = node.child_by_field_name("type")
+        return _text(impl_type) if impl_type is not None else None
+
+    if node.type == "type_declaration":
+        # Go: type Foo struct {...}
+        for child in node.named_children:
+            spec_name = child.child_by_field_name("name")
+            if spec_name is not None:
+                return _text(spec_name)
+        return None
+
+    if node.type == "arrow_function":
+        # JS/TS: const foo = () => {...}
+        parent = node.parent
+        if parent is not None and parent.type == "variable_declarator":
+            var_name = parent.child_by_field_name("name")
+            return _text(var_name) if var_name is not None else None
+        return None
+
+    # C/C++: 名字藏在 declarator 链中，例如 int *foo(int a)
+    declarator = node.child_by_field_name("declarator")
+    while declarator is not None:
+        if declarator.type in (
+            "identifier",
+            "field_identifier",
+            "qualified_identifier",
+            "destructor_name",
+            "operator_name",
+        ):
+            return _text(declarator).replace("::", ".")
+        declarator = declarator.child_by_field_name("declarator")
+    return None
+
+
+def qualified_name(node: Node, extension: str) -> Optional[str]:
+    """
+    获取定义的限定名，由外层定义的名字逐级拼接，例如 `Storage.read`。
+    Go 的方法使用接收者类型作为前缀。
+    """
+    name = definition_name(node)
+    if name is None:
+        return None
+
+    parts = [name]
+    if node.type == "method_declaration" and extension == ".go":
+        receiver = node.child_by_field_name("receiver")
+        if receiver is not None:
+            receiver_types = re.findall(r"\w+", _text(receiver))
+            if receiver_types:
+                parts.append(receiver_types[-1])
+
+    definition_types = _definition_types(extension)
+    parent = node.parent
+    while parent is not None:
+        if parent.type in definition_types:
+            parent_name = definition_name(parent)
+            if parent_name:
+                parts.append(parent_name)
+        parent = parent.parent
+    return ".".join(reversed(parts))
+
+
+def _chunk_metadata(
+    doc: Document, capture_name: str, node: Node, extension: str
+) -> Dict[str, Any]:
+    """代码块的元数据：继承文件元数据，并记录类型、行号与定义名"""
+    new_metadata = doc.metadata.copy()
+    new_metadata.update(
+        {
+            "type": capture_name,
+            "start_line": node.start_point[0] + 1,
+            "end_line": node.end_point[0] + 1,
+            "start_byte": node.start_byte,
+            "end_byte": node.end_byte,
+            "parent_source": doc.metadata.get("source", ""),
+        }
+    )
+    # 定义的名字与限定名，用于构建符号定义索引
+    name = qualified_name(node, extension)
+    if name:
+        new_metadata["name"] = name.split(".")[-1]
+        new_metadata["qualified_name"] = name
+    return new_metadata
+
+
+def _signature(node: Node, code_bytes: bytes) -> str:
+    """定义的签名：从节点开始到函数体 / 类体之前的部分，没有 body 字段时取第一行"""
+    body = node.child_by_field_name("body")
+    end = body.start_byte if body is not None else node.end_byte
+    text = code_bytes[node.start_byte : end].decode("utf8", errors="replace")
+    if body is None:
+        text = text.split("\n", 1)[0]
+    return text.rstrip()
+
+
+def _chunk_key(file_path: str, start_byte: int, end_byte: int) -> str:
+    return f"{file_path}:{start_byte}-{end_byte}"
+
+
+# 被切出的区间 (起始字节, 结束字节, 占位文本)
+Hole = Tuple[int, int, str]
+
+
+def _render(code_bytes: bytes, start: int, end: int, holes: List[Hole] = ()) -> str:
+    """取出 [start, end) 的代码，完全落在区间内的 hole 替换为占位文本"""
+    pieces = []
+    position = start
+    for hole_start, hole_end, stub in holes:
+        if hole_start < start or hole_end > end:
+            continue
+        pieces.append(code_bytes[position:hole_start].decode("utf8", errors="replace"))
+        pieces.append(stub)
+        position = hole_end
+    pieces.append(code_bytes[position:end].decode("utf8", errors="replace"))
+    return "".join(pieces)
+
+
+def _line_ranges(
+    code_bytes: bytes, start: int, end: int, max_tokens: int
+) -> List[Tuple[int, int]]:
+    """没有子节点可拆时按行切分（单行超限时保持整行）"""
+    ranges = []
+    range_start, used, position = start, 0, start
+    while position < end:
+        newline = code_bytes.find(b"\n", position, end)
+        line_end = end if newline == -1 else newline + 1
+        cost = count_tokens(code_bytes[position:line_end].decode("utf8", "replace"))
+        if used and used + cost > max_tokens:
+            ranges.append((range_start, position))
+            range_start, used = position, 0
+        used += cost
+        position = line_end
+    ranges.append((range_start, end))
+    return ranges
+
+
+def split_ranges(
+    node: Node,
+    code_bytes: bytes,
+    holes: List[Hole] = (),
+    max_tokens: int = settings.CHUNK_MAX_TOKENS,
+    min_tokens: int = settings.CHUNK_MIN_TOKENS,
+) -> List[Tuple[int, int]]:
+    """
+    按语法结构把超出 token 上限的节点切成若干连续的字节区间。
+
+    超限的节点沿具名子节点递归拆分（切点位于子节点所在行的行首），
+    没有子节点时按行切分；随后相邻的小片段合并，直到达到 `min_tokens` 下限
+    （合并后仍不超过上限）。hole 作为整体，不会被拆开。
+
+    Returns:
+        List[Tuple[int, int]]: 覆盖整个节点的字节区间；节点不超限时只有一个区间
+    """
+    costs: Dict[Tuple[int, int], int] = {}
+
+    def cost(start: int, end: int) -> int:
+        if (start, end) not in costs:
+            costs[(start, end)] = count_tokens(_render(code_bytes, start, end, holes))
+        return costs[(start, end)]
+
+    hole_ranges = {(hole_start, hole_end) for hole_start, hole_end, _ in holes}
+
+    def boundary(kid: Node) -> int:
+        # 子节点前只有缩进时从行首切开，行尾的逗号 / 分号留在上一段
+        position = kid.start_byte
+        while position > 0 and code_bytes[position - 1 : position] in (b" ", b"\t"):
+            position -= 1
+        if position == 0 or code_bytes[position - 1 : position] == b"\n":
+            return position
+        return kid.start_byte
+
+    def split(current: Node, start: int, end: int) -> List[Tuple[int, int]]:
+        if cost(start, end) <= max_tokens:
+            return [(start, end)]
+        if (current.start_byte, current.end_byte) in hole_ranges:
+            return [(start, end)]
+
+        kids = [
+            c
+            for c in current.named_children
+            if c.start_byte < end and c.end_byte > start
+        ]
+        if not kids:
+            return _line_ranges(code_bytes, start, end, max_tokens)
+        if len(kids) == 1:
+            return split(kids[0], start, end)
+
+        # 在每个具名子节点之前切开，子节点之后的标点和空白归入该子节点所在的一段
+        cuts = [start] + [max(boundary(kid), start) for kid in kids[1:]] + [end]
+        ranges = []
+        for kid, range_start, range_end in zip(kids, cuts, cuts[1:]):
+            if range_start < range_end:
+                ranges.extend(split(kid, range_start, range_end))
+        return ranges
+
+    if len(code_bytes[node.start_byte : node.end_byte]) <= max_tokens:
+        # 每个 token 至少一个字节，不可能超限
+        return [(node.start_byte, node.end_byte)]
+
+    merged: List[Tuple[int, int]] = []
+    for start, end in split(node, node.start_byte, node.end_byte):
+        if merged:
+            last_start, last_end = merged[-1]
+            small = (
+                cost(last_start, last_end) < min_tokens or cost(start, end) < min_tokens
+            )
+            if small and cost(last_start, end) <= max_tokens:
+                merged[-1] = (last_start, end)
+                continue
+        merged.append((start, end))
+    return merged
+
+
+def _node_parts(
+    node: Node, code_bytes: bytes, holes: List[Hole] = (), reserved: int = 0
+) -> List[Tuple[int, int, str]]:
+    """
+    将节点切成不超过 token 上限的若干段，返回 (起始字节, 结束字节, 内容)。
+    第一段之后的片段以节点签名开头，保留其所属定义的上下文。
+    `reserved` 为调用方另外添加的内容（外层签名、换行与缩进）占用的 token 数。
+    """
+    signature = _signature(node, code_bytes)
+    max_tokens = settings.CHUNK_MAX_TOKENS - reserved - count_tokens(signature + "\n")
+    ranges = split_ranges(node, code_bytes, holes, max_tokens=max(max_tokens, 1))
+    parts = []
+    for i, (start, end) in enumerate(ranges):
+        text = _render(code_bytes, start, end, holes)
+        if i > 0:
+            text = signature + "\n" + text.lstrip("\r\n")
+        parts.append((start, end, text))
+    return parts
+
+
+def _part_metadata(
+    metadata: Dict[str, Any],
+    code_bytes: bytes,
+    start: int,
+    end: int,
+    index: int,
+    total: int,
+) -> None:
+    """超限节点拆分后，为每个片段更新行号与字节区间"""
+    if total == 1:
+        return
+    # 片段开头的空白不计入行号
+    first = start + len(code_bytes[start:end]) - len(code_bytes[start:end].lstrip())
+    metadata.update(
+        {
+            "start_line": code_bytes.count(b"\n", 0, first) + 1,
+            "end_line": code_bytes.count(b"\n", 0, max(end - 1, first)) + 1,
+            "start_byte": start,
+            "end_byte": end,
+            "part": index + 1,
+            "parts": total,
+        }
+    )
+
+
+def hierarchical_chunks(
+    doc: Document,
+    captures: List[Tuple[str, Node]],
+    code_bytes: bytes,
+    extension: str,
+) -> List[Tuple[Document, Node]]:
+    """
+    分层切分：每个字节只属于一个代码块，嵌套定义不再被重复 embedding 和审查。
+
+    - 最外层的定义，以及嵌套在其中的具名定义（方法、内部类、具名函数）各自成为一个代码块
+    - 嵌套的匿名函数（回调、lambda 等）保留在外层代码块中，不单独切分
+    - 外层代码块中被切出的定义替换为一行签名占位 `def read(self, key): ...`
+    - 内层代码块开头附带外层定义的签名（如 `class Storage(Base):`），
+      元数据 `parent_key` 指向外层代码块的 `chunk_key`
+    - 超出 token 上限的代码块按语法结构继续拆分，见 `split_ranges`
+
+    Returns:
+        List[Tuple[Document, Node]]: 切分出的文档及其对应的语法节点
+    """
+    file_path = doc.metadata.get("source", "")
+
+    # 先处理外层节点，保证查找父节点时外层已经确定
+    unique = {node.id: (name, node) for name, node in captures}
+    ordered = sorted(unique.values(), key=lambda c: (c[1].start_byte, -c[1].end_byte))
+
+    parents: Dict[int, Optional[Node]] = {}
+    children: Dict[int, List[Node]] = {}
+    selected = []
+    for capture_name, node in ordered:
+        parent = node.parent
+        while parent is not None and parent.id not in parents:
+            parent = parent.parent
+        if parent is not None and definition_name(node) is None:
+            continue
+        parents[node.id] = parent
+        children[node.id] = []
+        if parent is not None:
+            children[parent.id].append(node)
+        selected.append((capture_name, node))
+
+    # 节点 ID -> [(起始字节, 结束字节, chunk_key)]，外层节点被拆分时子节点指向所在的片段
+    part_keys: Dict[int, List[Tuple[int, int, str]]] = {}
+
+    chunks = []
+    for capture_name, node in selected:
+        # 外层定义的签名，按原缩进排列
+        header = []
+        parent = parents[node.id]
+        while parent is not None:
+            indent = " " * parent.start_point[1]
+            header.append(indent + _signature(parent, code_bytes).lstrip())
+            parent = parents[parent.id]
+        header.reverse()
+
+        parent_key = None
+        parent = parents[node.id]
+        if parent is not None:
+            parent_key = next(
+                key
+                for start, end, key in part_keys[parent.id]
+                if start <= node.start_byte < end
+            )
+
+        # 切掉已单独成块的子定义，替换为签名占位
+        holes = [
+            (child.start_byte, child.end_byte, _signature(child, code_bytes) + " ...")
+            for child in children[node.id]
+        ]
+        indent = " " * node.start_point[1] if header else ""
+        # 外层签名、与正文之间的换行以及正文首行的缩进都计入上限
+        reserved = count_tokens("\n".join(header) + "\n" + indent) if header else 0
+        parts = _node_parts(node, code_bytes, holes, reserved)
+        part_keys[node.id] = []
+
+        for i, (start, end, text) in enumerate(parts):
+            key = _chunk_key(file_path, start, end)
+            part_keys[node.id].append((start, end, key))
+
+            new_metadata = _chunk_metadata(doc, capture_name, node, extension)
+            _part_metadata(new_metadata, code_bytes, start, end, i, len(parts))
+            new_metadata["chunk_key"] = key
+            if parent_key is not None:
+                new_metadata["parent_key"] = parent_key
+
+            content = "\n".join(header + [indent + text])
+            chunks.append((Document(page_content=content, metadata=new_metadata), node))
+    return chunks
+
+
+def chunks_from_tree(
+    doc: Document,
+    tree: Tree,
+    code_bytes: bytes,
+    extension: str,
+    hierarchical: bool = settings.HIERARCHICAL_CHUNKING,
+) -> List[Tuple[Document, Node]]:
+    """
+    在已解析的语法树上执行切分查询。
+
+    默认每个匹配到的定义都生成一个代码块（类与其中的方法会重叠）；
+    `hierarchical=True` 时使用不重叠的分层切分，见 `hierarchical_chunks`。
+    两种模式下超出 `settings.CHUNK_MAX_TOKENS` 的节点都会按语法结构继续拆分，
+    拆出的片段带有 `part` / `parts` 以及各自的行号和字节区间。
+
+    Returns:
+        List[Tuple[Document, Node]]: 切分出的文档及其对应的语法节点；没有匹配时返回空列表
+    """
+    query = get_query(extension, "query")
+    if not query:
+        return []
+
+    cursor = QueryCursor(query)
+
+    # 执行查询
+    matches = cursor.matches(tree.root_node)
+    captures = [
+        (capture_name, node)
+        for _, capture_dict in matches
+        for capture_name, nodes in capture_dict.items()
+        for node in nodes
+    ]
+
+    if hierarchical:
+        return hierarchical_chunks(doc, captures, code_bytes, extension)
+
+    chunks = []
+    # 处理匹配结果
+    for capture_name, node in captures:
+        parts = _node_parts(node, code_bytes)
+        for i, (start_byte, end_byte, block_content) in enumerate(parts):
+            # 创建新文档，保留元数据和上下文
+            new_metadata = _chunk_metadata(doc, capture_name, node, extension)
+            _part_metadata(
+                new_metadata, code_bytes, start_byte, end_byte, i, len(parts)
+            )
+            new_doc = Document(page_content=block_content, metadata=new_metadata)
+            chunks.append((new_doc, node))
+    return chunks
 
 
 def Splitter_with_treeSitter(documents: List[Document]):
@@ -17,68 +465,25 @@ def Splitter_with_treeSitter(documents: List[Document]):
     split_docs = []
 
     # 初始化一个通用的 splitter 为 tree-sitter不适用的文件切片
-    fallback_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=2000, chunk_overlap=200
-    )
+    fallback_splitter = get_fallback_splitter()
 
     for doc in documents:
         file_path = doc.metadata.get("source", "")
-        if "." not in file_path:
-            # 没有后缀名的文件
-            # 如：Makefile Dockerfile LICENSE 以及一些linux下的可执行文件
-            ext = ""
-        else:
-            ext = "." + file_path.split(".")[-1]
+        ext = get_extension(file_path)
 
-        # 获取文件对应的 tree-sitter 的语言设置
-        config = get_language_config(ext)
-        if config:
+        # 获取文件对应的 tree-sitter 查询（已编译并缓存）
+        if get_query(ext, "query"):
             try:
-                lang = config["lang"]
-                query_scm = config["query"]
-
-                parser = Parser(lang)
-                query = Query(lang, query_scm)
-                cursor = QueryCursor(query)
-
-                code_bytes = bytes(doc.page_content, "utf8")
-                tree = parser.parse(code_bytes)
-
-                # 执行查询
-                matches = cursor.matches(tree.root_node)
+                tree, code_bytes = parse_code(doc.page_content, ext)
+                chunks = chunks_from_tree(doc, tree, code_bytes, ext)
 
                 # 如果没有匹配到任何东西，则保留原文档
-                if not matches:
+                if not chunks:
                     splits = fallback_splitter.split_documents([doc])
                     split_docs.extend(splits)
                     continue
 
-                # 处理匹配结果
-                for match_id, capture_dict in matches:
-                    for capture_name, nodes in capture_dict.items():
-                        for node in nodes:
-                            start_byte = node.start_byte
-                            end_byte = node.end_byte
-
-                            block_content = code_bytes[start_byte:end_byte].decode(
-                                "utf8"
-                            )
-
-                            # 创建新文档，保留元数据和上下文
-                            new_metadata = doc.metadata.copy()
-                            new_metadata.update(
-                                {
-                                    "type": capture_name,
-                                    "start_line": node.start_point[0] + 1,
-                                    "end_line": node.end_point[0] + 1,
-                                    "parent_source": file_path,
-                                }
-                            )
-
-                            new_doc = Document(
-                                page_content=block_content, metadata=new_metadata
-                            )
-                            split_docs.append(new_doc)
+                split_docs.extend(chunk for chunk, _ in chunks)
             except Exception as e:
                 print(f"Error parsing {file_path}: {e}")
                 # 出错时退回通用切分
@@ -100,20 +505,33 @@ def extract_skeleton(code: str, extension: str) -> str:
     Returns:
         str: 提取的代码骨架
     """
-    config = get_language_config(extension)
-    if not config or "skeleton_query" not in config:
-        # 如果不支持这种语言，则截取前2000个字符
-        return code[:2000] + "/n...(truncated)..." if len(code) > 2000 else code
+    if not get_query(extension, "skeleton_query"):
+        return _truncate(code)
 
-    lang = config["lang"]
-    query_scm = config["skeleton_query"]
+    tree, code_bytes = parse_code(code, extension)
+    return skeleton_from_tree(tree, code_bytes, extension)
 
-    parser = Parser(lang)
-    query = Query(lang, query_scm)
-    cursor = QueryCursor(query)
 
-    code_bytes = bytes(code, "utf8")
-    tree = parser.parse(code_bytes)
+def _truncate(code: str) -> str:
+    # 如果不支持这种语言，则截取前2000个字符
+    return code[:2000] + "/n...(truncated)..." if len(code) > 2000 else code
+
+
+def skeleton_from_tree(tree: Tree, code_bytes: bytes, extension: str) -> str:
+    """
+    在已解析的语法树上提取代码骨架，供单次解析的分析流程复用。
+    Args:
+        tree (Tree): 语法树
+        code_bytes (bytes): 代码的 utf8 字节
+        extension (str): 代码文件后缀名
+    Returns:
+        str: 提取的代码骨架
+    """
+    query = get_query(extension, "skeleton_query")
+    if not query:
+        return _truncate(code_bytes.decode("utf8"))
+
+    cursor = QueryCursor(query)
 
     # 查询找到所有 body 节点
     captures = cursor.captures(tree.root_node)
@@ -0,0 +1,140 @@
+# src/rag/definition_index.py
+import json
+import os
+import re
+import threading
+from typing import Dict, Iterable, List
+
+from langchain_core.documents import Document
+
+from src.config import settings
+
+# 同名定义过多时只返回前几个，避免把大量无关代码塞进上下文
+MAX_DEFINITIONS_PER_SYMBOL = 3
+
+
+def normalize_symbol(symbol: str) -> str:
+    """统一符号写法：`Foo::bar()` / `foo->bar` / `self.foo.bar` -> 点分形式"""
+    symbol = re.sub(r"\(.*?\)", "", symbol.strip())
+    return re.sub(r"::|->|#", ".", symbol).strip(".")
+
+
+class DefinitionIndex:
+    """
+    符号定义索引：名字 / 限定名 -> 向量库中的 chunk ID。
+
+    在切分阶段由 tree-sitter 捕获的定义名构建（见 chunk 元数据中的 name / qualified_name），
+    检索节点先做精确查找，只有未命中时才回退到向量相似度检索。
+    索引按 (repo, branch, 文件) 持久化，增量运行时只替换重新切分过的文件。
+
+    同一个实例会被并发的审查状态机共享（线程池与 asyncio 两种方式）：查找表在
+    `add()` / `remove()` 结束时重建并整体替换，`lookup()` 只读查找表，计数在锁内更新。
+    """
+
+    def __init__(
+        self,
+        repo_name: str,
+        branch: str,
+        path: str = settings.DEFINITION_INDEX_PATH,
+    ):
+        self.path = path
+        self.key = f"{repo_name}@{branch}"
+        self.hits = 0
+        self.misses = 0
+
+        self._data: Dict[str, Dict[str, List[List[str]]]] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self._data = json.load(f)
+        # 文件路径 -> [[name, qualified_name, chunk_id], ...]
+        self._files = self._data.setdefault(self.key, {})
+
+        self._lock = threading.Lock()
+        self._by_qualified: Dict[str, List[str]] = {}
+        self._by_name: Dict[str, List[str]] = {}
+        self._rebuild()
+
+    def add(self, docs: List[Document], ids: List[str]) -> None:
+        """
+        记录一批已写入向量库的 chunk。同一文件的旧记录会被整体替换。
+        Args:
+            docs: 切分后的 chunk
+            ids: 与 docs 一一对应的向量库 ID
+        """
+        entries_by_file: Dict[str, List[List[str]]] = {}
+        for doc, chunk_id in zip(docs, ids):
+            file_path = doc.metadata.get("path") or doc.metadata.get("source", "")
+            entries = entries_by_file.setdefault(file_path, [])
+            name = doc.metadata.get("name")
+            if name:
+                entries.append([name, doc.metadata["qualified_name"], chunk_id])
+
+        with self._lock:
+            self._files.update(entries_by_file)
+            self._rebuild()
+
+    def remove(self, paths: Iterable[str]) -> None:
+        """删除这些文件的全部记录（文件被删除，或修改后不再产生任何 chunk）"""
+        with self._lock:
+            removed = [self._files.pop(file_path, None) for file_path in paths]
+            if any(entries is not None for entries in removed):
+                self._rebuild()
+
+    def _rebuild(self) -> None:
+        """在局部变量中构建查找表后一次性替换，并发的 `lookup()` 不会读到半成品"""
+        by_qualified: Dict[str, List[str]] = {}
+        by_name: Dict[str, List[str]] = {}
+        for entries in self._files.values():
+            for name, qualified, chunk_id in entries:
+                by_qualified.setdefault(qualified, []).append(chunk_id)
+                by_name.setdefault(name, []).append(chunk_id)
+        self._by_qualified, self._by_name = by_qualified, by_name
+
+    def lookup(self, symbol: str) -> List[str]:
+        """
+        精确查找符号定义对应的 chunk ID。
+
+        依次尝试：完整限定名 -> 逐级去掉前缀的限定名（`self.storage.read` -> `storage.read`）
+        -> 最后一段的短名字。
+        Returns:
+            List[str]: 命中的 chunk ID，未命中时为空列表
+        """
+        parts = normalize_symbol(symbol).split(".")
+        with self._lock:
+            by_qualified, by_name = self._by_qualified, self._by_name
+
+        ids: List[str] = []
+        for i in range(len(parts)):
+            ids = by_qualified.get(".".join(parts[i:]), [])
+            if ids:
+                break
+        if not ids:
+            ids = by_name.get(parts[-1], [])
+
+        with self._lock:
+            if ids:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return ids[:MAX_DEFINITIONS_PER_SYMBOL]
+
+    def save(self) -> None:
+        """原子写入索引文件"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        tmp_path = self.path + ".tmp"
+        with self._lock, open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def format_stats(self) -> str:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        hit_rate = hits / total if total else 0.0
+        return (
+            f"定义索引: 精确命中 {hits}, 回退向量检索 {misses} "
+            f"(命中率 {hit_rate:.1%})"
+        )
@@ -0,0 +1,167 @@
+# src/rag/embedding_cache.py
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Dict, List
+
+from langchain_core.embeddings import Embeddings
+
+from src.config import settings
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    基于内容寻址的 Embedding 磁盘缓存。
+
+    缓存键为 sha256(模型名 + 文本)，相同的代码块（跨分支、fork、重复运行）只计算一次。
+    存储使用 SQLite，超过 `max_entries` 时按最近访问时间淘汰 (LRU)。
+    """
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        namespace: str,
+        path: str = settings.EMBEDDING_CACHE_PATH,
+        max_entries: int = settings.EMBEDDING_CACHE_MAX_ENTRIES,
+    ):
+        self.underlying = underlying
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # 查询与文档的编码参数一致时，查询向量可以按批计算（与逐条 embed_query 结果相同）
+        query_kwargs = getattr(underlying, "query_encode_kwargs", None)
+        self._batch_queries = query_kwargs is not None and query_kwargs == getattr(
+            underlying, "encode_kwargs", None
+        )
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_last_access ON embeddings (last_access)"
+        )
+        self._conn.commit()
+
+    def _key(self, text: str, kind: str) -> str:
+        raw = f"{self.namespace}\0{kind}\0{text}".encode("utf-8")
+        return hashlib.sha256(raw).hexdigest()
+
+    def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        unique_keys = list(dict.fromkeys(keys))
+        now = time.time()
+
+        with self._lock:
+            # SQLite 对参数数量有限制，分批查询
+            for i in range(0, len(unique_keys), 500):
+                batch = unique_keys[i : i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch,
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+
+            if found:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._conn.commit()
+        return found
+
+    def _store(self, items: Dict[str, List[float]]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)",
+                [(key, array("f", vec).tobytes(), now) for key, vec in items.items()],
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """超出容量时删除最久未访问的条目"""
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN ("
+                "SELECT key FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+                (overflow,),
+            )
+
+    def _embed(self, texts: List[str], kind: str) -> List[List[float]]:
+        keys = [self._key(text, kind) for text in texts]
+        cached = self._lookup(keys)
+
+        # 去重后只把未命中的文本送入模型
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+
+        # 命中数按文本计，未命中数按实际送入模型的文本计；实例被并发的索引与检索共享
+        with self._lock:
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            if kind == "query" and not self._batch_queries:
+                vectors = [self.underlying.embed_query(t) for t in missing.values()]
+            else:
+                vectors = self.underlying.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self._store(computed)
+            cached.update(computed)
+
+        return [cached[key] for key in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts, "document")
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text], "query")[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        批量计算查询向量（例如检索节点一次查找多个符号）。
+        模型对查询和文档使用相同编码参数时，未命中的查询合并为一次批量计算。
+        """
+        return self._embed(texts, "query")
+
+    def reset_stats(self) -> None:
+        """清零命中统计。实例在进程内共享，每次索引运行开始时调用，统计只反映本次运行"""
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, float]:
+        """返回自上次 `reset_stats()` 以来的缓存命中统计"""
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+        }
+
+    def format_stats(self) -> str:
+        stats = self.stats()
+        return (
+            f"Embedding 缓存: 命中 {stats['hits']}, 未命中 {stats['misses']} "
+            f"(命中率 {stats['hit_rate']:.1%})"
+        )
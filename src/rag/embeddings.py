@@ -0,0 +1,122 @@
+# src/rag/embeddings.py
+import atexit
+import threading
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+from langchain_huggingface import HuggingFaceEmbeddings
+
+from src.config import settings
+
+# 可选的推理后端 -> SentenceTransformer 的构造参数
+# onnx / onnx-int8 需要额外安装 `sentence-transformers[onnx]`，openvino 需要 `[openvino]`
+EMBEDDING_BACKENDS = {
+    "torch": {},
+    "onnx": {"backend": "onnx"},
+    "onnx-int8": {
+        "backend": "onnx",
+        "model_kwargs": {"file_name": settings.EMBEDDING_ONNX_INT8_FILE},
+    },
+    "openvino": {"backend": "openvino"},
+}
+
+# 少于该数量的文本直接在主进程中计算，多进程分发的开销不划算
+MIN_MULTI_PROCESS_TEXTS = 256
+
+
+def embedding_namespace(
+    model_name: str = settings.EMBEDDING_MODEL,
+    backend: str = settings.EMBEDDING_BACKEND,
+) -> str:
+    """
+    Embedding 缓存的命名空间。不同后端（尤其是量化模型）算出的向量有差异，因此分开缓存。
+    量化模型按模型文件区分，更换 `EMBEDDING_ONNX_INT8_FILE` 后不会复用旧文件算出的向量。
+    """
+    if backend == "torch":
+        return model_name
+    file_name = (
+        EMBEDDING_BACKENDS.get(backend, {}).get("model_kwargs", {}).get("file_name")
+    )
+    if file_name:
+        return f"{model_name}@{backend}:{file_name}"
+    return f"{model_name}@{backend}"
+
+
+class MultiProcessEmbeddings(Embeddings):
+    """
+    使用常驻多进程池计算文档向量。
+
+    HuggingFaceEmbeddings 自带的 `multi_process` 每次调用都会重新启动进程池并重新加载模型，
+    流式流水线逐批写入时开销远大于计算本身。这里的进程池在第一次大批量计算时启动，
+    进程退出时关闭；查询和小批量文档仍在主进程中计算。
+    """
+
+    def __init__(self, model: HuggingFaceEmbeddings):
+        self.model = model
+        # 与 HuggingFaceEmbeddings 保持一致，CachedEmbeddings 据此判断查询能否按批计算
+        self.encode_kwargs = model.encode_kwargs
+        self.query_encode_kwargs = model.query_encode_kwargs
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = self.model._client.start_multi_process_pool()
+                atexit.register(self.close)
+            return self._pool
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if len(texts) < MIN_MULTI_PROCESS_TEXTS:
+            return self.model.embed_documents(texts)
+
+        # 与 HuggingFaceEmbeddings._embed 的预处理保持一致，保证两条路径结果相同
+        texts = [text.replace("\n", " ") for text in texts]
+        vectors = self.model._client.encode_multi_process(
+            texts, self._get_pool(), **self.encode_kwargs
+        )
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.model.embed_query(text)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self.model._client.stop_multi_process_pool(self._pool)
+                self._pool = None
+
+
+def build_embeddings(
+    model_name: str = settings.EMBEDDING_MODEL,
+    backend: str = settings.EMBEDDING_BACKEND,
+    batch_size: int = settings.EMBEDDING_BATCH_SIZE,
+    multi_process: bool = settings.EMBEDDING_MULTI_PROCESS,
+) -> Embeddings:
+    """
+    按配置构建 Embedding 模型。
+
+    Args:
+        model_name: sentence-transformers 模型名
+        backend: 推理后端，见 `EMBEDDING_BACKENDS`
+        batch_size: 每次前向计算的文本数
+        multi_process: 是否使用常驻多进程池计算文档向量
+
+    Returns:
+        Embeddings: Embedding 模型
+    """
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(
+            f"不支持的 Embedding 后端: {backend}，可选: {', '.join(EMBEDDING_BACKENDS)}"
+        )
+
+    # 查询与文档使用相同的编码参数，查询向量也可以按批计算
+    encode_kwargs = {"batch_size": batch_size}
+    model = HuggingFaceEmbeddings(
+        model_name=model_name,
+        cache_folder=settings.CACHE_FOLDER,
+        model_kwargs=dict(EMBEDDING_BACKENDS[backend]),
+        encode_kwargs=encode_kwargs,
+        query_encode_kwargs=dict(encode_kwargs),
+    )
+    return MultiProcessEmbeddings(model) if multi_process else model
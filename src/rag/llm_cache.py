@@ -0,0 +1,180 @@
+# src/rag/llm_cache.py
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import warnings
+from functools import lru_cache
+from typing import Any, Dict, Optional, Sequence
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.globals import set_llm_cache
+from langchain_core.load import dumps, loads
+from langchain_core.outputs import Generation
+
+from src.config import settings
+
+
+def _load_generations(text: str) -> Optional[RETURN_VAL_TYPE]:
+    """
+    反序列化缓存的 generations，内容不是 Generation 列表时返回 None（视为未命中）。
+    langchain-core 0.3 的 `loads` 只会还原 langchain 命名空间下的可序列化对象，
+    这里再检查还原结果的类型。
+    """
+    with warnings.catch_warnings():
+        # loads 仍处于 beta，屏蔽其提示
+        warnings.simplefilter("ignore")
+        generations = loads(text)
+    if isinstance(generations, list) and all(
+        isinstance(generation, Generation) for generation in generations
+    ):
+        return generations
+    return None
+
+
+def _count_tokens(generations: Sequence[Generation]) -> int:
+    """从 AIMessage.usage_metadata 中读取这次调用消耗的 token 数"""
+    total = 0
+    for generation in generations:
+        message = getattr(generation, "message", None)
+        usage = getattr(message, "usage_metadata", None)
+        if usage:
+            total += usage.get("total_tokens", 0)
+    return total
+
+
+class SQLiteLLMCache(BaseCache):
+    """
+    LLM 响应的磁盘缓存。
+
+    缓存键为 sha256(模型配置 + 完整渲染后的 prompt)，模型名、温度等参数变化时自动失效。
+    存储使用 SQLite：超过 `ttl` 秒的条目视为过期，超过 `max_entries` 时按最近访问时间淘汰 (LRU)。
+    """
+
+    def __init__(
+        self,
+        path: str = settings.LLM_CACHE_PATH,
+        ttl: int = settings.LLM_CACHE_TTL,
+        max_entries: int = settings.LLM_CACHE_MAX_ENTRIES,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, generations TEXT NOT NULL, tokens INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_llm_last_access ON llm_cache (last_access)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        raw = f"{llm_string}\0{prompt}".encode("utf-8")
+        return hashlib.sha256(raw).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = self._key(prompt, llm_string)
+        now = time.time()
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT generations, tokens, created_at FROM llm_cache WHERE key = ?",
+                (key,),
+            ).fetchone()
+
+            if row is not None and self.ttl > 0 and now - row[2] > self.ttl:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+
+            generations = _load_generations(row[0]) if row is not None else None
+            if generations is None:
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+            self.tokens_saved += row[1]
+        return generations
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = self._key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache "
+                "(key, generations, tokens, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, dumps(return_val), _count_tokens(return_val), now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        """删除过期条目；超出容量时再删除最久未访问的条目"""
+        if self.ttl > 0:
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl,)
+            )
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                "SELECT key FROM llm_cache ORDER BY last_access ASC LIMIT ?)",
+                (overflow,),
+            )
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, float]:
+        """返回本进程内的缓存命中统计"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "tokens_saved": self.tokens_saved,
+        }
+
+    def format_stats(self) -> str:
+        stats = self.stats()
+        return (
+            f"LLM 缓存: 命中 {stats['hits']}, 未命中 {stats['misses']} "
+            f"(命中率 {stats['hit_rate']:.1%}), 节省 {stats['tokens_saved']} tokens"
+        )
+
+
+@lru_cache(maxsize=1)
+def enable_llm_cache() -> Optional[SQLiteLLMCache]:
+    """
+    为进程内所有 LLM / Chat 模型启用全局缓存。
+    所有链都使用 `temperature=0`，相同的模型 + prompt 可以直接复用上一次的响应。
+    使用 lru_cache 保证只初始化一次。
+
+    Returns:
+        Optional[SQLiteLLMCache]: 缓存实例；`LLM_CACHE_ENABLED=0` 时返回 None
+    """
+    if not settings.LLM_CACHE_ENABLED:
+        return None
+    cache = SQLiteLLMCache()
+    set_llm_cache(cache)
+    return cache
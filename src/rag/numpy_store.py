@@ -0,0 +1,420 @@
+# src/rag/numpy_store.py
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from langchain_core.vectorstores.utils import maximal_marginal_relevance
+
+# 向量文件每次扩容的最小行数
+MIN_CAPACITY = 1024
+
+
+def _normalize(vectors: Sequence[Sequence[float]]) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[None, :]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def _matches(metadata: Dict[str, Any], filter: Optional[Dict[str, Any]]) -> bool:
+    """元数据过滤：与 Chroma 的 where 相同的写法，支持等值条件和 `$and`"""
+    if not filter:
+        return True
+    if "$and" in filter:
+        return all(_matches(metadata, condition) for condition in filter["$and"])
+    return all(metadata.get(key) == value for key, value in filter.items())
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    进程内向量库：单机运行时替代 ChromaDB 服务，检索不经过网络。
+
+    存储结构（目录 `path/collection_name`）:
+        - vectors.f32: 归一化后的 float32 向量矩阵，通过内存映射 (memmap) 读写，
+          按倍数扩容，不需要整体载入内存
+        - store.sqlite: 行号 -> (ID, 文本, 元数据)
+    元数据常驻内存用于过滤（每个过滤条件的行掩码会被缓存），文本只在返回结果时按行号读取。
+    删除的行会被标记并在之后写入时复用。
+
+    检索为一次矩阵乘法 + argpartition 取 top-k，多条查询可以合并为一次计算
+    (`similarity_search_by_vectors`)；MMR 在 top-fetch_k 候选上计算。
+    """
+
+    def __init__(
+        self,
+        collection_name: str,
+        embedding_function: Embeddings,
+        path: str,
+    ):
+        self.collection_name = collection_name
+        self._embedding = embedding_function
+        self.directory = os.path.join(path, collection_name)
+        os.makedirs(self.directory, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(
+            os.path.join(self.directory, "store.sqlite"), check_same_thread=False
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS docs ("
+            "row INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, "
+            "text TEXT NOT NULL, metadata TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        self._conn.commit()
+        self._load()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    # ---------- 存储 ----------
+
+    def _load(self) -> None:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'dim'").fetchone()
+        self._dim = int(row[0]) if row else 0
+
+        self._ids: List[Optional[str]] = []
+        self._metadatas: List[Optional[dict]] = []
+        self._row_by_id: Dict[str, int] = {}
+        for row, doc_id, metadata in self._conn.execute(
+            "SELECT row, id, metadata FROM docs ORDER BY row"
+        ):
+            self._ensure_rows(row + 1)
+            self._ids[row] = doc_id
+            self._metadatas[row] = json.loads(metadata)
+            self._row_by_id[doc_id] = row
+
+        self._alive = np.array([i is not None for i in self._ids], dtype=bool)
+        self._free = [i for i, doc_id in enumerate(self._ids) if doc_id is None]
+        self._vectors: Optional[np.memmap] = None
+        # 过滤条件 -> 行掩码，写入或删除时失效
+        self._filter_masks: Dict[str, np.ndarray] = {}
+        if self._dim:
+            self._open_vectors(len(self._ids))
+
+    def _check_dim(self, dim: int) -> None:
+        if self._dim and dim != self._dim:
+            raise ValueError(
+                f"集合 {self.collection_name} 的向量维度为 {self._dim}，"
+                f"但 Embedding 模型输出 {dim} 维。更换 Embedding 模型或后端后请删除该集合重新索引。"
+            )
+
+    def _ensure_rows(self, rows: int) -> None:
+        while len(self._ids) < rows:
+            self._ids.append(None)
+            self._metadatas.append(None)
+
+    def _open_vectors(self, rows: int) -> None:
+        """打开向量文件，文件不足 rows 行时按倍数扩容"""
+        vectors_path = os.path.join(self.directory, "vectors.f32")
+        row_bytes = self._dim * 4
+        size = os.path.getsize(vectors_path) if os.path.exists(vectors_path) else 0
+        capacity = size // row_bytes
+
+        if capacity < rows:
+            capacity = max(rows, capacity * 2, MIN_CAPACITY)
+            with open(vectors_path, "ab") as f:
+                f.truncate(capacity * row_bytes)
+
+        if self._vectors is not None:
+            self._vectors.flush()
+        self._vectors = np.memmap(
+            vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self._dim)
+        )
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        *,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        vectors = _normalize(self._embedding.embed_documents(texts))
+
+        with self._lock:
+            self._check_dim(vectors.shape[1])
+            if not self._dim:
+                self._dim = vectors.shape[1]
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO meta VALUES ('dim', ?)", (str(self._dim),)
+                )
+
+            # 已存在的 ID 原地覆盖（upsert），其余优先复用已删除的行
+            rows = []
+            for doc_id in ids:
+                if doc_id in self._row_by_id:
+                    rows.append(self._row_by_id[doc_id])
+                elif self._free:
+                    rows.append(self._free.pop())
+                else:
+                    rows.append(len(self._ids))
+                    self._ensure_rows(len(self._ids) + 1)
+                self._row_by_id[doc_id] = rows[-1]
+
+            if self._vectors is None or self._vectors.shape[0] < len(self._ids):
+                self._open_vectors(len(self._ids))
+            self._vectors[rows] = vectors
+
+            alive = np.zeros(len(self._ids), dtype=bool)
+            alive[: len(self._alive)] = self._alive
+            alive[rows] = True
+            self._alive = alive
+
+            for row, doc_id, metadata in zip(rows, ids, metadatas):
+                self._ids[row] = doc_id
+                self._metadatas[row] = metadata or {}
+
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO docs (row, id, text, metadata) VALUES (?, ?, ?, ?)",
+                [
+                    (row, doc_id, text, json.dumps(metadata or {}, ensure_ascii=False))
+                    for row, doc_id, text, metadata in zip(rows, ids, texts, metadatas)
+                ],
+            )
+            self._conn.commit()
+            self._vectors.flush()
+            self._filter_masks = {}
+        return ids
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        if not ids:
+            return None
+        with self._lock:
+            rows = [
+                self._row_by_id.pop(doc_id)
+                for doc_id in ids
+                if doc_id in self._row_by_id
+            ]
+            for row in rows:
+                self._ids[row] = None
+                self._metadatas[row] = None
+                self._alive[row] = False
+            self._free.extend(rows)
+            self._filter_masks = {}
+            self._conn.executemany(
+                "DELETE FROM docs WHERE row = ?", [(row,) for row in rows]
+            )
+            self._conn.commit()
+        return True
+
+    def count(self) -> int:
+        """集合中的 chunk 数（与 Chroma 集合的 count() 对应）"""
+        return len(self._row_by_id)
+
+    def delete_collection(self) -> None:
+        """删除整个集合（与 Chroma.delete_collection 对应）"""
+        with self._lock:
+            self._conn.close()
+            self._vectors = None
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
+        rows = [self._row_by_id[doc_id] for doc_id in ids if doc_id in self._row_by_id]
+        return self._documents(rows)
+
+    def _row_documents(self, rows: List[int]) -> List[Tuple[int, Document]]:
+        """按行号读取文档，返回 (行号, 文档) 并保持 rows 的顺序；已删除的行被跳过"""
+        if not rows:
+            return []
+        placeholders = ",".join("?" * len(rows))
+        with self._lock:
+            found = {
+                row: (doc_id, text, metadata)
+                for row, doc_id, text, metadata in self._conn.execute(
+                    f"SELECT row, id, text, metadata FROM docs WHERE row IN ({placeholders})",
+                    rows,
+                )
+            }
+        return [
+            (
+                row,
+                Document(
+                    page_content=found[row][1],
+                    metadata=json.loads(found[row][2]),
+                    id=found[row][0],
+                ),
+            )
+            for row in rows
+            if row in found
+        ]
+
+    def _documents(self, rows: List[int]) -> List[Document]:
+        """按行号读取文档，保持 rows 的顺序"""
+        return [doc for _, doc in self._row_documents(rows)]
+
+    # ---------- 检索 ----------
+
+    def _filter_mask(self, filter: Dict[str, Any]) -> np.ndarray:
+        """
+        过滤条件命中的行掩码。按过滤条件缓存，同一分区的反复检索只在第一次遍历元数据，
+        之后只做向量化的掩码运算；写入或删除后失效。调用方需持有锁。
+        """
+        key = json.dumps(filter, sort_keys=True, ensure_ascii=False, default=str)
+        mask = self._filter_masks.get(key)
+        if mask is None:
+            mask = np.fromiter(
+                (m is not None and _matches(m, filter) for m in self._metadatas),
+                dtype=bool,
+                count=len(self._metadatas),
+            )
+            self._filter_masks[key] = mask
+        return mask
+
+    def _top_k(
+        self, queries: np.ndarray, k: int, filter: Optional[Dict[str, Any]]
+    ) -> Tuple[List[np.ndarray], np.ndarray]:
+        """
+        一次矩阵乘法计算所有查询的 top-k。
+        返回的行号只在持有锁期间有效（删除的行会被复用），调用方需在同一个锁内读取文档。
+
+        Returns:
+            Tuple[List[np.ndarray], np.ndarray]: 每条查询按相似度降序的行号, 相似度矩阵
+        """
+        with self._lock:
+            if self._vectors is None:
+                return [np.empty(0, dtype=np.int64) for _ in queries], np.empty(0)
+            self._check_dim(queries.shape[1])
+            mask = self._alive.copy()
+            if filter:
+                mask &= self._filter_mask(filter)
+            matrix = self._vectors[: len(mask)]
+
+        k = min(k, int(mask.sum()))
+        if k == 0:
+            return [np.empty(0, dtype=np.int64) for _ in queries], np.empty(0)
+
+        scores = queries @ matrix.T
+        scores[:, ~mask] = -np.inf
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+        return list(np.take_along_axis(top, order, axis=1)), scores
+
+    def similarity_search_by_vectors(
+        self,
+        embeddings: Sequence[Sequence[float]],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> List[List[Document]]:
+        """多条查询向量合并为一次矩阵乘法检索，返回与 embeddings 一一对应的结果"""
+        if not len(embeddings):
+            return []
+        with self._lock:
+            top, _ = self._top_k(_normalize(embeddings), k, filter)
+            return [self._documents(rows.tolist()) for rows in top]
+
+    def similarity_search_with_score_by_vector(
+        self,
+        embedding: Sequence[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> List[Tuple[Document, float]]:
+        """返回 (文档, 余弦距离)，距离越小越相似（与 Chroma 的 cosine 距离一致）"""
+        # top-k、读取文本与按行号取分数在同一个锁内完成，行不会在中途被删除或复用
+        with self._lock:
+            top, scores = self._top_k(_normalize(embedding), k, filter)
+            return [
+                (doc, 1.0 - float(scores[0, row]))
+                for row, doc in self._row_documents(top[0].tolist())
+            ]
+
+    def similarity_search_by_vector(
+        self,
+        embedding: Sequence[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        return self.similarity_search_by_vectors([embedding], k, filter)[0]
+
+    def similarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        return self.similarity_search_by_vector(
+            self._embedding.embed_query(query), k, filter
+        )
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(
+            self._embedding.embed_query(query), k, filter
+        )
+
+    def _select_relevance_score_fn(self):
+        return lambda distance: 1.0 - distance
+
+    def max_marginal_relevance_search_by_vector(
+        self,
+        embedding: Sequence[float],
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        query = _normalize(embedding)
+        with self._lock:
+            top, _ = self._top_k(query, fetch_k, filter)
+            candidates = top[0]
+            if not len(candidates):
+                return []
+            candidate_vectors = np.asarray(self._vectors[candidates])
+            selected = maximal_marginal_relevance(
+                query[0], candidate_vectors, lambda_mult=lambda_mult, k=k
+            )
+            return self._documents([int(candidates[i]) for i in selected])
+
+    def max_marginal_relevance_search(
+        self,
+        query: str,
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        return self.max_marginal_relevance_search_by_vector(
+            self._embedding.embed_query(query), k, fetch_k, lambda_mult, filter
+        )
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        *,
+        ids: Optional[List[str]] = None,
+        collection_name: str = "default",
+        path: str = "./.index/vectors",
+        **kwargs: Any,
+    ) -> "NumpyVectorStore":
+        store = cls(collection_name, embedding, path)
+        store.add_texts(texts, metadatas, ids=ids)
+        return store
@@ -0,0 +1,160 @@
+# src/rag/reduce.py
+from functools import lru_cache
+from typing import List, Tuple
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable
+from langchain_openai import ChatOpenAI
+
+from src.config import settings
+from src.rag.tokens import count_tokens, pack_by_directory, truncate_to_tokens
+
+# (路径, 报告内容)：路径用于按目录分组，中间结果的路径为其覆盖的公共目录
+Report = Tuple[str, str]
+
+# 超过该层数仍未收敛时直接截断进入最终汇总，保证总延迟有界
+MAX_REDUCE_LEVELS = 4
+
+PARTIAL_REDUCE_TEMPLATE = """
+你是一个资深技术专家。以下是同一个项目中 {scope} 下若干文件（或子目录）的审查摘要。
+请将它们合并为一份精炼的中间摘要，供后续的整体汇总使用。
+
+【审查摘要列表】
+{summaries}
+
+【要求】
+1. 保留所有关键问题（Bug、安全漏洞、性能瓶颈）及其涉及的文件路径，不要遗漏。
+2. 合并重复的问题，删除无关的细节。
+3. 必须使用中文回答。
+
+【中间摘要】
+"""
+
+
+@lru_cache(maxsize=1)
+def get_partial_reduce_chain() -> Runnable:
+    """构建中间汇总链，使用 lru_cache 实现单例模式"""
+    llm = ChatOpenAI(model="deepseek-chat", temperature=0)
+    prompt = ChatPromptTemplate.from_template(PARTIAL_REDUCE_TEMPLATE)
+    return prompt | llm | StrOutputParser()
+
+
+def common_directory(paths: List[str]) -> str:
+    """返回一组文件路径的公共目录"""
+    split_paths = [path.split("/")[:-1] for path in paths]
+    common = []
+    for parts in zip(*split_paths):
+        if any(part != parts[0] for part in parts):
+            break
+        common.append(parts[0])
+    return "/".join(common)
+
+
+def _format_reports(reports: List[Report]) -> str:
+    return "\n\n".join(text for _, text in reports)
+
+
+def _plan_level(
+    reports: List[Report], budget: int
+) -> Tuple[List[List[Report]], List[dict]]:
+    """将报告按目录装箱，返回分组及每组的中间汇总输入"""
+    groups = pack_by_directory(
+        reports,
+        path_of=lambda report: report[0],
+        tokens_of=lambda report: count_tokens(report[1]),
+        budget=budget,
+    )
+    inputs = [
+        {
+            "scope": common_directory([path for path, _ in group]) or "项目根目录",
+            "summaries": _format_reports(group),
+        }
+        for group in groups
+    ]
+    return groups, inputs
+
+
+def _collect_level(
+    groups: List[List[Report]], inputs: List[dict], outputs: list, budget: int
+) -> List[Report]:
+    """将中间汇总的输出整理为下一层的报告；失败的分组退化为截断后的原文"""
+    reports = []
+    for group, inp, output in zip(groups, inputs, outputs):
+        if isinstance(output, Exception):
+            print(f"中间汇总失败 ({inp['scope']}): {output}")
+            output = truncate_to_tokens(inp["summaries"], budget // len(groups))
+        path = common_directory([path for path, _ in group])
+        reports.append((path, f"### 目录: {inp['scope']}\n{output}"))
+    return reports
+
+
+def _fit(reports: List[Report], budget: int) -> List[Report]:
+    """截断单份超出预算的报告"""
+    return [(path, truncate_to_tokens(text, budget)) for path, text in reports]
+
+
+def _needs_reduce(reports: List[Report], budget: int, level: int) -> bool:
+    total = sum(count_tokens(text) for _, text in reports)
+    return total > budget and level < MAX_REDUCE_LEVELS
+
+
+def _final_input(reports: List[Report], budget: int) -> dict:
+    return {"summaries": truncate_to_tokens(_format_reports(reports), budget)}
+
+
+def tree_reduce(
+    reports: List[Report],
+    final_chain: Runnable,
+    budget: int = settings.REDUCE_TOKEN_BUDGET,
+    max_concurrency: int = settings.REVIEW_MAX_CONCURRENCY,
+) -> str:
+    """
+    分层汇总：报告总量超过 token 预算时，按目录装箱并行做中间汇总，再逐层向上合并，
+    直到能放进一次最终汇总请求。
+
+    每一层都是并行的，层数约为 log(报告数)，最终汇总请求的输入不超过 `budget`，
+    因此无论审查了多少文件，最后一步的延迟都有上界。
+
+    Args:
+        reports: (文件路径, 报告内容) 列表
+        final_chain: 最终汇总链，输入为 {"summaries": str}
+        budget: 每次汇总请求输入的 token 上限
+        max_concurrency: 同一层中间汇总的最大并发数
+
+    Returns:
+        str: 最终汇总结果
+    """
+    reports = _fit(reports, budget)
+    level = 0
+    while _needs_reduce(reports, budget, level):
+        level += 1
+        groups, inputs = _plan_level(reports, budget)
+        print(f"分层汇总第 {level} 层: {len(reports)} 份报告 -> {len(groups)} 组")
+        outputs = get_partial_reduce_chain().batch(
+            inputs, config={"max_concurrency": max_concurrency}, return_exceptions=True
+        )
+        reports = _collect_level(groups, inputs, outputs, budget)
+
+    return final_chain.invoke(_final_input(reports, budget))
+
+
+async def atree_reduce(
+    reports: List[Report],
+    final_chain: Runnable,
+    budget: int = settings.REDUCE_TOKEN_BUDGET,
+    max_concurrency: int = settings.REVIEW_MAX_CONCURRENCY,
+) -> str:
+    """`tree_reduce` 的异步版本"""
+    reports = _fit(reports, budget)
+    level = 0
+    while _needs_reduce(reports, budget, level):
+        level += 1
+        groups, inputs = _plan_level(reports, budget)
+        print(f"分层汇总第 {level} 层: {len(reports)} 份报告 -> {len(groups)} 组")
+        outputs = await get_partial_reduce_chain().abatch(
+            inputs, config={"max_concurrency": max_concurrency}, return_exceptions=True
+        )
+        reports = _collect_level(groups, inputs, outputs, budget)
+
+    return await final_chain.ainvoke(_final_input(reports, budget))
@@ -5,6 +5,9 @@ from langchain_openai import ChatOpenAI, OpenAI
 from langchain_core.vectorstores import VectorStoreRetriever
 from typing import List
 from langchain_core.documents import Document
+from src.rag.reduce import common_directory, tree_reduce
+from src.rag.tokens import count_tokens, pack_by_directory, truncate_to_tokens
+from src.config import settings
 
 
 # 定义 Prompt 模板
@@ -123,21 +126,29 @@ def review_repo_global(docs: List[Document]) -> str:
         temperature=0,
     )
 
-    # 1. 预处理：将文档分批 (Batching)
-    # 假设每个 chunk 约 500-1000 tokens，Gemini 上下文很大，可以一次处理多个。
-    # 设置为 10，意味着 332 个片段只需要约 34 次请求，大幅节省 API 调用次数。
-    BATCH_SIZE = 10
-    doc_batches = [docs[i : i + BATCH_SIZE] for i in range(0, len(docs), BATCH_SIZE)]
+    # 1. 预处理：将文档按 token 预算装箱 (Batching)
+    # 按实际 token 数装箱，小片段合并成更满的请求，大片段不会超出模型上下文；
+    # 按文件路径排序后装箱，同一文件、同一目录的片段尽量落在同一个批次。
+    def format_chunk(doc: Document) -> str:
+        return f"### 文件: {doc.metadata.get('source', 'unknown')} ###\n{doc.page_content}\n"
+
+    budget = settings.MAP_TOKEN_BUDGET
+    chunk_texts = [
+        (doc, truncate_to_tokens(format_chunk(doc), budget))
+        for doc in sorted(docs, key=lambda d: d.metadata.get("source", ""))
+    ]
+    packed = pack_by_directory(
+        chunk_texts,
+        path_of=lambda item: item[0].metadata.get("source", ""),
+        tokens_of=lambda item: count_tokens(item[1]),
+        budget=budget,
+    )
+    doc_batches = [[doc for doc, _ in batch] for batch in packed]
 
     map_inputs = []
-    for batch in doc_batches:
+    for batch in packed:
         # 拼接该批次的所有代码
-        bundle_text = "\n".join(
-            [
-                f"### 文件: {doc.metadata.get('source', 'unknown')} ###\n{doc.page_content}\n"
-                for doc in batch
-            ]
-        )
+        bundle_text = "\n".join([text for _, text in batch])
         map_inputs.append({"context_bundle": bundle_text})
 
     print(f"优化策略: 将 {len(docs)} 个片段合并为 {len(map_inputs)} 个批次进行分析...")
@@ -160,16 +171,17 @@ def review_repo_global(docs: List[Document]) -> str:
     # 2. Reduce 阶段：汇总结果
     print("正在汇总分析结果 (Reduce Phase)...")
 
-    # 拼接摘要
-    combined_summaries = "\n\n".join(
-        [
-            f"--- 批次 {i+1} 分析摘要 ---\n{summary}"
-            for i, summary in enumerate(summaries)
-        ]
-    )
+    # 以批次覆盖的公共目录作为路径，超出 token 预算时按目录分层汇总
+    reports = [
+        (
+            common_directory([doc.metadata.get("source", "") for doc in batch]),
+            f"--- 批次 {i+1} 分析摘要 ---\n{summary}",
+        )
+        for i, (batch, summary) in enumerate(zip(doc_batches, summaries))
+    ]
 
     reduce_prompt = ChatPromptTemplate.from_template(REDUCE_TEMPLATE)
     reduce_chain = reduce_prompt | llm | StrOutputParser()
-    final_report = reduce_chain.invoke({"summaries": combined_summaries})
+    final_report = tree_reduce(reports, reduce_chain)
 
     return final_report
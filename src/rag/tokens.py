@@ -0,0 +1,104 @@
+# src/rag/tokens.py
+import os
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, TypeVar
+
+import tiktoken
+
+from src.config import settings
+
+T = TypeVar("T")
+
+
+@lru_cache(maxsize=1)
+def get_encoding() -> Optional[tiktoken.Encoding]:
+    """
+    加载 tiktoken 编码。使用 lru_cache 实现单例模式，编码表只加载一次。
+
+    Returns:
+        Optional[tiktoken.Encoding]: 编码表无法加载（例如离线环境）时返回 None
+    """
+    try:
+        return tiktoken.get_encoding(settings.TOKEN_ENCODING)
+    except Exception as e:
+        print(f"无法加载 tiktoken 编码 {settings.TOKEN_ENCODING}，改用字符数估算: {e}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """计算文本的 token 数；编码不可用时按 3 个字符约 1 个 token 估算"""
+    encoding = get_encoding()
+    if encoding is None:
+        return len(text) // 3 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """截断文本，使其不超过 max_tokens 个 token"""
+    encoding = get_encoding()
+    if encoding is None:
+        limit = max_tokens * 3
+        return text if len(text) <= limit else text[:limit] + "\n...(truncated)..."
+
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens]) + "\n...(truncated)..."
+
+
+def pack_by_directory(
+    items: List[T],
+    path_of: Callable[[T], str],
+    tokens_of: Callable[[T], int],
+    budget: int,
+) -> List[List[T]]:
+    """
+    将条目按 token 预算装箱，同一目录的条目尽量放在同一个箱子里。
+
+    条目先按目录分组，并按目录路径排序，使相邻目录落在同一个箱子里。
+    整个目录能放进当前箱子时直接放入；放不下但不超过一个箱子时另起新箱；
+    目录本身超过预算时逐条装箱。
+    单个条目超过预算时独占一个箱子，由调用方负责截断。
+
+    Args:
+        items: 待装箱的条目
+        path_of: 返回条目所属文件路径的函数
+        tokens_of: 返回条目 token 数的函数
+        budget: 每个箱子的 token 上限
+
+    Returns:
+        List[List[T]]: 装箱结果
+    """
+    groups: Dict[str, List[T]] = {}
+    for item in items:
+        groups.setdefault(os.path.dirname(path_of(item)), []).append(item)
+
+    bins: List[List[T]] = []
+    current: List[T] = []
+    used = 0
+
+    def close():
+        nonlocal current, used
+        if current:
+            bins.append(current)
+        current, used = [], 0
+
+    for _, group in sorted(groups.items()):
+        costs = [tokens_of(item) for item in group]
+        total = sum(costs)
+
+        if used + total > budget and total <= budget:
+            close()
+        if used + total <= budget:
+            current.extend(group)
+            used += total
+            continue
+
+        # 目录超过一个箱子的容量，逐条装箱
+        for item, cost in zip(group, costs):
+            if current and used + cost > budget:
+                close()
+            current.append(item)
+            used += cost
+    close()
+    return bins
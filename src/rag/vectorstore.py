@@ -1,23 +1,89 @@
 import chromadb
 from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+from langchain_core.runnables.config import run_in_executor
 from src.config import settings
+from src.ingestion.manifest import IndexManifest
+from src.rag.definition_index import DefinitionIndex
+from src.rag.embedding_cache import CachedEmbeddings
+from src.rag.embeddings import build_embeddings, embedding_namespace
+from src.rag.numpy_store import NumpyVectorStore
+import hashlib
+import re
 from functools import lru_cache
+from typing import Dict, List, Optional
+
+PARTITION_MODES = ("branch", "repo", "none")
+
+
+def partition_name(repo_name: str = "", branch: str = "") -> str:
+    """
+    返回 (repo, branch) 所在的集合名。
+
+    按 `settings.VECTOR_STORE_PARTITION` 划分:
+        - branch: 每个 repo@branch 一个集合
+        - repo: 每个仓库一个集合，不同分支共用
+        - none: 所有仓库共用 `settings.COLLECTION_NAME`
+    未指定仓库时返回共用集合。
+    集合名只能包含 [a-zA-Z0-9._-]，仓库名中的其他字符被替换，再附加短哈希避免替换后重名。
+    """
+    mode = settings.VECTOR_STORE_PARTITION
+    if mode not in PARTITION_MODES:
+        raise ValueError(
+            f"不支持的向量库分区方式: {mode}，可选: {', '.join(PARTITION_MODES)}"
+        )
+    if mode == "none" or not repo_name:
+        return settings.COLLECTION_NAME
+
+    key = repo_name if mode == "repo" else f"{repo_name}@{branch}"
+    slug = re.sub(r"[^a-zA-Z0-9._-]+", "_", key)[:64].strip("._-")
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:8]
+    return f"{settings.COLLECTION_NAME}-{slug}-{digest}"
+
+
+def partition_filter(repo_name: str = "", branch: str = "") -> Optional[Dict]:
+    """
+    返回在 (repo, branch) 所在集合中检索时需要的元数据过滤条件。
+    集合中只有该分支的数据时返回 None，不做多余的过滤。
+    """
+    if not repo_name:
+        return None
+    mode = settings.VECTOR_STORE_PARTITION
+    if mode == "repo":
+        return {"branch": branch}
+    if mode == "none":
+        return {"$and": [{"repo_name": repo_name}, {"branch": branch}]}
+    return None
 
 
 @lru_cache(maxsize=1)
-def get_vectorstore() -> Chroma:
+def get_embedding_model() -> CachedEmbeddings:
     """
-    初始化并返回 ChromaDB 向量库客户端。
-    使用 lru_cache 实现单例模式，避免重复加载 Embedding 模型。
+    所有分区共用的 Embedding 模型（单例）。
+    Embedding 后端、批大小与多进程计算由 `settings.EMBEDDING_*` 配置。
+    模型外层包裹磁盘缓存，只有新文本才会进入模型计算。
+    """
+    return CachedEmbeddings(build_embeddings(), namespace=embedding_namespace())
 
-    Returns:
-        Chroma: 已初始化的 ChromaDB 向量库实例
+
+@lru_cache(maxsize=1)
+def get_chroma_client():
     """
-    embedding_model = HuggingFaceEmbeddings(
-        model_name=settings.EMBEDDING_MODEL, cache_folder=settings.CACHE_FOLDER
-    )
+    所有分区共用的 ChromaDB 客户端（单例）。
+
+    存储后端由 `settings.VECTOR_STORE_BACKEND` 选择:
+        - http: 连接 Docker 中的 ChromaDB 服务（默认）
+        - embedded: 进程内的持久化 ChromaDB，无需启动容器
+    """
+    backend = settings.VECTOR_STORE_BACKEND
+    if backend == "embedded":
+        client = chromadb.PersistentClient(path=settings.CHROMA_PERSIST_DIR)
+        print(f"Embedded ChromaDB loaded from {settings.CHROMA_PERSIST_DIR}")
+        return client
+    if backend != "http":
+        raise ValueError(f"不支持的向量库后端: {backend}，可选: http, embedded, numpy")
 
     client = chromadb.HttpClient(settings.CHROMA_HOST, settings.CHROMA_PORT)
 
@@ -28,11 +94,255 @@ def get_vectorstore() -> Chroma:
         raise ConnectionError(
             f"无法连接到 ChromaDB ({settings.CHROMA_HOST}:{settings.CHROMA_PORT})。请确保 Docker 容器已启动。错误信息: {e}"
         )
+    print("ChromaDB client connected successfully via Docker!")
+    return client
+
+
+@lru_cache(maxsize=None)
+def get_vectorstore(repo_name: str = "", branch: str = "") -> VectorStore:
+    """
+    初始化并返回 (repo, branch) 所在分区的向量库。
+    使用 lru_cache 实现每个分区一个实例；Embedding 模型与 ChromaDB 客户端在各分区间共用。
 
-    vector_store = Chroma(
-        collection_name=settings.COLLECTION_NAME,
-        embedding_function=embedding_model,
-        client=client,
+    每个仓库（或分支）写入独立的集合（见 `partition_name`），检索只扫描当前仓库的数据，
+    也不会返回其他项目中的同名定义。检索时配合 `partition_filter` 使用。
+
+    存储后端由 `settings.VECTOR_STORE_BACKEND` 选择:
+        - http: 连接 Docker 中的 ChromaDB 服务（默认）
+        - embedded: 进程内的持久化 ChromaDB，无需启动容器
+        - numpy: 进程内的 NumpyVectorStore（内存映射的归一化向量矩阵）
+    后两者在单机运行时省去了每次检索的网络往返和序列化开销。
+
+    Args:
+        repo_name: 仓库全名，为空时返回共用集合
+        branch: 分支名称
+
+    Returns:
+        VectorStore: 已初始化的向量库实例
+    """
+    collection_name = partition_name(repo_name, branch)
+
+    if settings.VECTOR_STORE_BACKEND == "numpy":
+        vector_store = NumpyVectorStore(
+            collection_name, get_embedding_model(), settings.NUMPY_STORE_PATH
+        )
+        print(f"NumpyVectorStore loaded from {vector_store.directory}")
+        return vector_store
+
+    return Chroma(
+        collection_name=collection_name,
+        embedding_function=get_embedding_model(),
+        client=get_chroma_client(),
     )
-    print("ChromaDB client connected successfully via Docker!")
-    return vector_store
+
+
+def collection_size(vector_store: VectorStore) -> int:
+    """集合中的 chunk 数"""
+    if isinstance(vector_store, NumpyVectorStore):
+        return vector_store.count()
+    return vector_store._collection.count()
+
+
+def reset_manifest_if_empty(
+    vector_store: VectorStore, manifest: IndexManifest, repo_name: str, branch: str
+) -> None:
+    """
+    分区集合为空、但清单中仍有该 repo@branch 的记录时（例如刚切换分区方式，
+    或集合被删除），清除清单记录，让本次运行重新索引全部文件。必须在 `diff()` 之前调用。
+    """
+    if manifest.file_shas(repo_name, branch) and collection_size(vector_store) == 0:
+        print(f"集合 {partition_name(repo_name, branch)} 为空，重新索引全部文件")
+        manifest.forget(repo_name, branch)
+
+
+def similarity_search_batch(
+    vector_store: VectorStore,
+    queries: List[str],
+    k: int = 3,
+    filter: Optional[Dict[str, str]] = None,
+) -> List[List[Document]]:
+    """
+    一次请求完成多条查询的相似度检索。
+
+    所有查询的 embedding 合并为一批计算，再通过一次 `query(query_embeddings=[...])`
+    发给 ChromaDB（NumpyVectorStore 则为一次矩阵乘法），
+    避免逐条检索时每个符号各自一次模型调用和一次网络往返。
+
+    Args:
+        vector_store: 向量库实例
+        queries: 查询文本
+        k: 每条查询返回的结果数
+        filter: 元数据过滤条件
+
+    Returns:
+        List[List[Document]]: 与 queries 一一对应的检索结果
+    """
+    if not queries:
+        return []
+
+    embeddings = vector_store.embeddings
+    if isinstance(embeddings, CachedEmbeddings):
+        query_embeddings = embeddings.embed_queries(queries)
+    else:
+        query_embeddings = [embeddings.embed_query(query) for query in queries]
+
+    if isinstance(vector_store, NumpyVectorStore):
+        return vector_store.similarity_search_by_vectors(query_embeddings, k, filter)
+
+    results = vector_store._collection.query(
+        query_embeddings=query_embeddings,
+        n_results=k,
+        where=filter,
+        include=["documents", "metadatas"],
+    )
+    return [
+        [
+            Document(page_content=text, metadata=metadata or {}, id=chunk_id)
+            for text, metadata, chunk_id in zip(texts, metadatas, ids)
+            if text is not None
+        ]
+        for texts, metadatas, ids in zip(
+            results["documents"], results["metadatas"], results["ids"]
+        )
+    ]
+
+
+async def asimilarity_search_batch(
+    vector_store: VectorStore,
+    queries: List[str],
+    k: int = 3,
+    filter: Optional[Dict[str, str]] = None,
+) -> List[List[Document]]:
+    """`similarity_search_batch` 的异步版本（在线程池中执行）"""
+    return await run_in_executor(
+        None, similarity_search_batch, vector_store, queries, k, filter
+    )
+
+
+def chunk_id(doc: Document) -> str:
+    """
+    由 (仓库, 分支, 文件路径, 字节区间, 内容哈希) 生成确定性的 chunk ID。
+
+    同一代码块每次运行得到相同的 ID，重复写入变为覆盖 (upsert)，不会在集合中留下重复副本。
+    通用 splitter 切出的 chunk 没有字节区间，仅由内容哈希区分。
+    """
+    metadata = doc.metadata
+    content_hash = hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()
+    raw = "\0".join(
+        str(part)
+        for part in (
+            metadata.get("repo_name", ""),
+            metadata.get("branch", ""),
+            metadata.get("path") or metadata.get("source", ""),
+            metadata.get("start_byte", ""),
+            metadata.get("end_byte", ""),
+            content_hash,
+        )
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def add_chunks(
+    vector_store: VectorStore,
+    docs: List[Document],
+    chunk_ids_by_path: Dict[str, List[str]],
+    batch_size: int = settings.UPSERT_BATCH_SIZE,
+) -> List[str]:
+    """
+    以确定性 ID 分批 upsert 一批 chunk，并把 ID 按文件路径累计到 `chunk_ids_by_path`。
+    重复运行时集合大小保持不变。
+
+    Returns:
+        List[str]: 与 docs 一一对应的 chunk ID
+    """
+    ids = [chunk_id(doc) for doc in docs]
+
+    # 同一节点被多条查询规则捕获时 ID 相同，只写入一次（同一次 upsert 中 ID 不能重复）
+    unique: Dict[str, Document] = {}
+    for doc, doc_id in zip(docs, ids):
+        unique.setdefault(doc_id, doc)
+
+    unique_ids = list(unique)
+    for start in range(0, len(unique_ids), batch_size):
+        batch_ids = unique_ids[start : start + batch_size]
+        vector_store.add_documents(
+            [unique[doc_id] for doc_id in batch_ids], ids=batch_ids
+        )
+
+    for doc_id, doc in unique.items():
+        chunk_ids_by_path.setdefault(doc.metadata.get("path", ""), []).append(doc_id)
+    return ids
+
+
+def reset_embedding_stats(vector_store: VectorStore) -> None:
+    """索引运行开始时清零 Embedding 缓存统计（模型在各分区、各次运行间共用）"""
+    if isinstance(vector_store.embeddings, CachedEmbeddings):
+        vector_store.embeddings.reset_stats()
+
+
+def finalize_index(
+    vector_store: VectorStore,
+    manifest: IndexManifest,
+    repo_name: str,
+    branch: str,
+    chunk_ids_by_path: Dict[str, List[str]],
+    definition_index: Optional[DefinitionIndex] = None,
+) -> None:
+    """
+    删除被修改/删除文件的旧 chunk（不会误删本次刚写入的 ID），然后提交清单。
+    传入 `definition_index` 时同时删除这些文件在定义索引中的记录；
+    本次重新写入了 chunk 的文件由 `DefinitionIndex.add` 整体替换，这里不删除。
+    """
+    new_ids = {chunk_id for ids in chunk_ids_by_path.values() for chunk_id in ids}
+    stale_ids = [
+        chunk_id
+        for chunk_id in manifest.stale_chunk_ids(repo_name, branch)
+        if chunk_id not in new_ids
+    ]
+    if stale_ids:
+        vector_store.delete(ids=stale_ids)
+        print(f"已删除 {len(stale_ids)} 个过期 chunk")
+    if definition_index is not None:
+        definition_index.remove(
+            path
+            for path in manifest.stale_paths(repo_name, branch)
+            if path not in chunk_ids_by_path
+        )
+
+    manifest.commit(repo_name, branch, chunk_ids_by_path)
+
+    if isinstance(vector_store.embeddings, CachedEmbeddings):
+        print(vector_store.embeddings.format_stats())
+
+
+def index_documents(
+    vector_store: VectorStore,
+    docs: List[Document],
+    manifest: IndexManifest,
+    repo_name: str,
+    branch: str,
+    definition_index: Optional[DefinitionIndex] = None,
+) -> List[str]:
+    """
+    增量写入向量库：upsert 新 chunk，删除被修改/删除文件的旧 chunk，最后更新清单。
+    传入 `definition_index` 时同步更新定义索引（不落盘）。
+
+    Args:
+        vector_store: 向量库实例
+        docs: 本次新增或修改文件切分得到的 chunk
+        manifest: 已经通过 ingest 阶段 `diff()` 暂存了差异的增量索引清单
+
+    Returns:
+        List[str]: 与 docs 一一对应的 chunk ID
+    """
+    chunk_ids_by_path: Dict[str, List[str]] = {}
+    reset_embedding_stats(vector_store)
+    ids = add_chunks(vector_store, docs, chunk_ids_by_path)
+    print(f"已写入 {len(set(ids))} 个 chunk")
+    if definition_index is not None:
+        definition_index.add(docs, ids)
+
+    finalize_index(
+        vector_store, manifest, repo_name, branch, chunk_ids_by_path, definition_index
+    )
+    return ids
@@ -0,0 +1,81 @@
+# tests/test_numpy_store.py
+import sys
+import threading
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from src.rag.numpy_store import NumpyVectorStore
+
+
+class TextEmbeddings(Embeddings):
+    """文本 "v<i>" 映射到确定的向量，分数可以由文本反推"""
+
+    def embed_documents(self, texts):
+        return [self._vector(int(text.split("-")[0][1:])) for text in texts]
+
+    def embed_query(self, text):
+        return self._vector(int(text[1:]))
+
+    @staticmethod
+    def _vector(i):
+        angle = i * 0.1
+        return [float(np.cos(angle)), float(np.sin(angle)), 0.0]
+
+
+def test_scores_belong_to_returned_documents_under_concurrent_writes(tmp_path):
+    store = NumpyVectorStore("tst", TextEmbeddings(), str(tmp_path))
+    store.add_texts([f"v{i}" for i in range(50)], ids=[f"id{i}" for i in range(50)])
+    errors = []
+    stop = threading.Event()
+
+    def writer():
+        # 反复删除再写入，删除的行会被其他 ID 复用
+        n = 0
+        while not stop.is_set():
+            store.delete([f"id{n % 50}"])
+            store.add_texts([f"v{(n * 7) % 50}-{n}"], ids=[f"new{n}"])
+            n += 1
+
+    def reader():
+        query = TextEmbeddings._vector(0)
+        try:
+            for _ in range(200):
+                for doc, distance in store.similarity_search_with_score_by_vector(
+                    query, k=5
+                ):
+                    expected = 1.0 - float(
+                        np.dot(
+                            query,
+                            store.embeddings.embed_documents([doc.page_content])[0],
+                        )
+                    )
+                    assert distance == pytest.approx(expected, abs=1e-5)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer)] + [
+        threading.Thread(target=reader) for _ in range(3)
+    ]
+    # 频繁切换线程，放大检索与写入交错的机会
+    previous = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads[1:]:
+            thread.join()
+    finally:
+        stop.set()
+        threads[0].join()
+        sys.setswitchinterval(previous)
+
+    assert errors == []
+
+
+def test_rejects_vectors_of_a_different_width(tmp_path):
+    store = NumpyVectorStore("tst", TextEmbeddings(), str(tmp_path))
+    store.add_texts(["v1"], ids=["a"])
+    with pytest.raises(ValueError, match="tst"):
+        store.similarity_search_by_vector([1.0, 0.0], k=1)
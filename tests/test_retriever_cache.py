@@ -0,0 +1,83 @@
+# tests/test_retriever_cache.py
+import asyncio
+
+from langchain_core.documents import Document
+
+from src.agent import recursive_reviewer
+from src.agent.retrieval_cache import RetrievalCache
+
+
+class FakeStore:
+    """定义索引未命中，get_by_ids 不会返回任何内容"""
+
+    def get_by_ids(self, ids):
+        return []
+
+    async def aget_by_ids(self, ids):
+        return []
+
+
+def _unrelated(queries):
+    # 向量检索总会返回 top-k，这里返回一个与查询符号无关的定义
+    doc = Document(
+        page_content="def other():\n    return 1",
+        metadata={"source": "a.py", "type": "function_definition"},
+    )
+    return [[doc] for _ in queries]
+
+
+def _setup(monkeypatch):
+    calls = []
+
+    def search(vector_store, queries, k=3, filter=None):
+        calls.append(list(queries))
+        return _unrelated(queries)
+
+    async def asearch(vector_store, queries, k=3, filter=None):
+        return search(vector_store, queries, k, filter)
+
+    monkeypatch.setattr(recursive_reviewer, "get_vectorstore", lambda *a: FakeStore())
+    monkeypatch.setattr(recursive_reviewer, "similarity_search_batch", search)
+    monkeypatch.setattr(recursive_reviewer, "asimilarity_search_batch", asearch)
+    config = {"configurable": {"retrieval_cache": RetrievalCache()}}
+    return calls, config
+
+
+def _state(symbols):
+    return {"unknown_symbols": symbols, "repo_name": "o/r", "branch": "main"}
+
+
+def test_unknown_symbol_gives_same_context_through_cache(monkeypatch):
+    calls, config = _setup(monkeypatch)
+
+    first = recursive_reviewer.retriever_node(_state(["missing_helper"]), config)
+    second = recursive_reviewer.retriever_node(_state(["missing_helper"]), config)
+
+    assert first["retrieved_context"] == second["retrieved_context"]
+    assert "未在核心代码库中找到定义" in first["retrieved_context"][0]
+    # 第二次由负缓存回答，不再检索
+    assert calls == [["definition of missing_helper"]]
+    assert config["configurable"]["retrieval_cache"].negative_hits == 1
+
+
+def test_unknown_symbol_same_context_sync_then_async(monkeypatch):
+    calls, config = _setup(monkeypatch)
+
+    first = asyncio.run(
+        recursive_reviewer.aretriever_node(_state(["missing_helper"]), config)
+    )
+    second = recursive_reviewer.retriever_node(_state(["missing_helper"]), config)
+
+    assert first["retrieved_context"] == second["retrieved_context"]
+    assert len(calls) == 1
+
+
+def test_confirmed_symbol_is_cached_with_its_definition(monkeypatch):
+    calls, config = _setup(monkeypatch)
+
+    first = recursive_reviewer.retriever_node(_state(["other"]), config)
+    second = recursive_reviewer.retriever_node(_state(["other"]), config)
+
+    assert first["retrieved_context"] == second["retrieved_context"]
+    assert "def other()" in first["retrieved_context"][0]
+    assert config["configurable"]["retrieval_cache"].hits == 1
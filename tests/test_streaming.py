@@ -0,0 +1,92 @@
+# tests/test_streaming.py
+import tracemalloc
+
+from langchain_core.documents import Document
+
+from src.ingestion.streaming import stream_pipeline
+
+MAX_IN_FLIGHT = 20
+
+
+class FakeVectorStore:
+    """只计数、不保存内容的向量库"""
+
+    embeddings = None
+
+    def __init__(self):
+        self.count = 0
+
+    def add_documents(self, documents, ids=None):
+        self.count += len(documents)
+        return ids
+
+
+def _source(i: int) -> str:
+    # 每个文件都有一个高复杂度函数，全部会被 L1 选为关键代码
+    branches = "\n".join(
+        f"    if x == {j}:\n        y = x * {j} + {i}\n    elif x > {j}:\n        y -= {j}"
+        for j in range(12)
+    )
+    return f"def handler_{i}(x):\n    y = 0\n{branches}\n    return y\n"
+
+
+def _documents(files: int):
+    for i in range(files):
+        path = f"src/module_{i}.py"
+        yield Document(
+            page_content=_source(i),
+            metadata={
+                "path": path,
+                "source": f"https://api.github.com/o/r/blob/main/{path}",
+            },
+        )
+
+
+def _run(files: int, tmp_path):
+    store = FakeVectorStore()
+    result = stream_pipeline(
+        _documents(files),
+        "o/r",
+        "main",
+        store,
+        max_in_flight=MAX_IN_FLIGHT,
+        workers=1,
+    )
+    return result, store
+
+
+def _peak(files: int, tmp_path) -> int:
+    tracemalloc.start()
+    try:
+        result, _ = _run(files, tmp_path)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    result.close()
+    return peak
+
+
+def test_critical_chunks_are_spilled_and_reloaded(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    result, store = _run(45, tmp_path)
+    try:
+        chunks = result.load_critical_chunks()
+        assert result.files == 45
+        assert len(chunks) == result.critical == 45
+        assert chunks[0].page_content.startswith("def handler_0")
+        assert len(result.load_skeletons()) == 45
+        assert [doc.page_content for doc in result.load_l2_candidates()] == [""] * 45
+    finally:
+        result.close()
+
+
+def test_peak_memory_does_not_grow_with_number_of_batches(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # 预热：解析器、查询编译等一次性缓存不计入比较
+    _peak(MAX_IN_FLIGHT, tmp_path)
+
+    small = _peak(2 * MAX_IN_FLIGHT, tmp_path)
+    large = _peak(20 * MAX_IN_FLIGHT, tmp_path)
+
+    # 批次数增加 10 倍，峰值内存基本不变
+    assert large < small * 1.5